@@ -15,7 +15,12 @@ setup(
             'ssgeneratehtml = ssbuilder:generate_from_configuration',
             'sslengthcheck = ssbuilder:check_query_length',
             'ssmergedir = ssbuilder:cmd_merge_dir_csvs',
-            'ssmetadata = ssbuilder:question_csv'
+            'ssmetadata = ssbuilder:question_csv',
+            'ssreshape = ssbuilder:cmd_reshape_long',
+            'ssperf = ssbuilder:cmd_page_performance',
+            'ssverify = ssbuilder:cmd_verify_responses',
+            'ssquestions = ssbuilder:cmd_join_question_catalog',
+            'ssserve = ssbuilder:cmd_serve_study'
         ],
     },
 )
@@ -1,6 +1,12 @@
-from .builder import generate_from_configuration,question_csv
+from .builder import generate_from_configuration,question_csv, load_configuration
+from .builder import build_study, build_files
+from .sinks import DirectorySink, MemorySink, CallbackSink, ZipSink, TarSink
 from .single_normal_curve import NormalCurveSlider
 from .tradeoff_questions import TradeoffLine, TradeoffBar
 from .utils import  md_params, check_query_length
 from .utils import merge_dir_csvs, cmd_merge_dir_csvs
-
+from .analysis import reshape_long, cmd_reshape_long
+from .analysis import verify_responses, cmd_verify_responses
+from .analysis import question_catalog, join_question_catalog, cmd_join_question_catalog
+from .perf import page_performance, cmd_page_performance
+from .serve import StudyPages, serve_study, cmd_serve_study
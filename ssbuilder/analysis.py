@@ -0,0 +1,408 @@
+import click
+import os
+import re
+import numpy as np
+import pandas as pd
+
+from .builder import load_configuration, question_variables, figure_classes
+from .utils import read_data, write_data
+
+
+def variable_catalog(full_config, metadata=None):
+    '''
+    describe every variable the questions in a study send, one row per variable name
+
+    Parameters
+    ----------
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    metadata : list of strings
+        keys of each question's `metadata` to include as columns
+
+    Returns
+    -------
+    catalog : DataFrame
+        indexed by variable name (`column`) with `question_id`, `variable` (the kind, eg 
+        `location` or `confirm`), `figure_type` and any metadata columns
+    '''
+    metadata = list(metadata) if metadata else []
+    rows = [[var_name, q['question_id'].lower(), kind, q.get('figure_type', 'NormalCurveSlider')] +
+            [q.get('metadata', {}).get(m) for m in metadata]
+            for q in full_config for kind, var_name in question_variables(q).items()]
+    catalog = pd.DataFrame(rows, columns=['column', 'question_id', 'variable', 'figure_type'] + metadata)
+    
+    return catalog.drop_duplicates('column').set_index('column')
+
+
+def match_variable_columns(columns, catalog):
+    '''
+    match response columns to the variable names of a study, as they are or with the 
+    source file suffix `merge_dir_csvs` adds to columns that are in more than one file
+
+    Parameters
+    ----------
+    columns : list of strings
+        columns of the responses
+    catalog : DataFrame
+        variables of the study, from `variable_catalog`
+
+    Returns
+    -------
+    matched : DataFrame
+        one row per matched column with the `column`, the variable `name` it matches 
+        and its `source` suffix, missing for columns without one
+    '''
+    columns = pd.Series(pd.Index(columns))
+    if catalog.empty or columns.empty:
+        return pd.DataFrame(columns=['name', 'source', 'column'])
+    # match each column to the longest variable name it starts with, in one pass
+    var_pattern = '|'.join(re.escape(v) for v in sorted(catalog.index, key=len, reverse=True))
+    matched = columns.str.extract('^(?P<name>' + var_pattern + ')(?:_(?P<source>.+))?$')
+    matched['column'] = columns
+    return matched.dropna(subset=['name']).reset_index(drop=True)
+
+
+def reshape_long(responses, full_config, id_vars=['id'], metadata=None):
+    '''
+    reshape merged wide responses (one column per `<logging_var>_<question_id>`) to a 
+    tidy table with one row per participant, question and variable. Columns that got a 
+    source file suffix when merging are matched too, the suffix is kept in `source`
+
+    Parameters
+    ----------
+    responses : DataFrame
+        merged responses, eg from `merge_dir_csvs`
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    id_vars : list of strings
+        columns that identify a participant, kept on every row
+    metadata : list of strings
+        keys of each question's `metadata` to include as columns
+
+    Returns
+    -------
+    long_df : DataFrame
+        `id_vars`, `question_id`, `variable`, `value`, `figure_type`, `source`, `column`
+        and any metadata columns
+    '''
+    id_vars = list(id_vars)
+    catalog = variable_catalog(full_config, metadata)
+
+    matched = match_variable_columns(responses.columns.drop(id_vars, errors='ignore'), catalog)
+
+    long_df = responses.melt(id_vars=id_vars, value_vars=matched['column'].tolist(),
+                             var_name='column', value_name='value')
+    long_df['column'] = long_df['column'].astype('category')
+
+    # join the catalog on the column categories, then expand by category codes
+    column_info = matched.set_index('column').join(catalog, on='name').drop(columns='name')
+    column_info = column_info.reindex(long_df['column'].cat.categories)
+    info_values = column_info.iloc[long_df['column'].cat.codes].reset_index(drop=True)
+    info_values = info_values.astype('category')
+
+    long_df = pd.concat([long_df.reset_index(drop=True), info_values], axis=1)
+    out_cols = id_vars + ['question_id', 'variable', 'value', 'figure_type', 'source',
+                          'column'] + list(metadata or [])
+    return long_df[out_cols]
+
+
+def question_catalog(full_config, metadata=None):
+    '''
+    describe every question in a study, one row per question
+
+    Parameters
+    ----------
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    metadata : list of strings
+        keys of each question's `metadata` to include as columns
+
+    Returns
+    -------
+    catalog : DataFrame
+        indexed by `question_id` with the `figure_type`, `question_text` and any metadata
+        columns, all categorical
+    '''
+    metadata = list(metadata) if metadata else []
+    rows = [[q['question_id'].lower(), q.get('figure_type', 'NormalCurveSlider'), 
+             q.get('question_text', '')] + [(q.get('metadata') or {}).get(m) for m in metadata]
+            for q in full_config]
+    catalog = pd.DataFrame(rows, columns=['question_id', 'figure_type', 'question_text'] + metadata)
+
+    return catalog.drop_duplicates('question_id').set_index('question_id').astype('category')
+
+
+def join_question_catalog(responses, full_config, id_vars=['id'], metadata=None):
+    '''
+    reshape merged wide responses to one row per participant and question, with a 
+    column for each kind of variable (eg `location`, `overlap`, `confirm`) and the 
+    question's catalog (see `question_catalog`) joined on. Unlike `reshape_long` the 
+    variables of a question stay on one row. Columns that got a source file suffix when 
+    merging are matched too, each source of a question is its own row
+
+    Parameters
+    ----------
+    responses : DataFrame
+        merged responses, eg from `merge_dir_csvs`
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    id_vars : list of strings
+        columns that identify a participant, kept on every row
+    metadata : list of strings
+        keys of each question's `metadata` to include as columns
+
+    Returns
+    -------
+    question_df : DataFrame
+        `id_vars`, `question_id`, `source`, one column per variable kind, `figure_type`, 
+        `question_text` and any metadata columns. Questions with none of their variables
+        in the responses are left out. A kind is numbers if all of its values are, 
+        otherwise text
+    '''
+    id_vars = list(id_vars)
+    catalog = question_catalog(full_config, metadata)
+    variables = variable_catalog(full_config)
+    matched = match_variable_columns(responses.columns.drop(id_vars, errors='ignore'), variables)
+    if matched.empty:
+        # eg the configuration of another study, or a file that is not merged responses
+        raise click.ClickException('none of the question variables are columns of the '
+                                   'responses, expected eg ' + ', '.join(variables.index[:5]))
+
+    # the question, source and kind of each column, each question and source is a group 
+    #  of rows in the output, in the order of the configuration
+    column_info = matched.join(variables[['question_id', 'variable']], on='name')
+    column_info['question_id'] = pd.Categorical(column_info['question_id'], 
+                                                categories=catalog.index)
+    column_info['source'] = column_info['source'].fillna('')
+    groups = column_info[['question_id', 'source']].drop_duplicates()
+    groups = groups.sort_values(['question_id', 'source']).reset_index(drop=True)
+    column_info = column_info.merge(groups.reset_index(names='group'), on=['question_id', 'source'])
+    kind_codes, kinds = pd.factorize(column_info['variable'])
+
+    # one long frame of every matched value, melt keeps each column's values together
+    n_rows = len(responses)
+    long_df = responses[column_info['column'].tolist()].reset_index(drop=True)
+    long_df = long_df.melt(value_name='value', ignore_index=False)
+    long_df['group'] = np.repeat(column_info['group'].to_numpy(), n_rows)
+    long_df['kind'] = pd.Categorical.from_codes(np.repeat(kind_codes, n_rows), kinds)
+
+    # a kind can be numbers for some questions and text for others, keep one type per kind
+    #  each distinct value is converted once, missing values have code -1, the last
+    codes, uniques = pd.factorize(long_df['value'])
+    unique_numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce')
+    numbers = pd.Series(np.append(unique_numbers.to_numpy(dtype=float), np.nan)[codes],
+                        index=long_df.index)
+    numeric_kinds = (numbers.notna() | (codes == -1)).groupby(long_df['kind'], observed=True).all()
+    is_number = long_df['kind'].map(numeric_kinds).astype(bool).to_numpy()
+
+    # pivot the kinds to columns, by group and row
+    pivot = lambda values: values.set_index(['group', 'kind'], append=True)['value'].unstack('kind')
+    question_df = pd.concat([pivot(long_df[is_number].assign(value=numbers[is_number])),
+                             pivot(long_df[~is_number].astype({'value': 'string'}))], axis=1)
+    question_df = question_df.swaplevel().sort_index()[list(kinds)]
+    question_df.columns = list(kinds)
+    group, row = [question_df.index.get_level_values(i) for i in range(2)]
+
+    question_df = pd.concat([responses[id_vars].iloc[row].reset_index(drop=True),
+                             groups.iloc[group].reset_index(drop=True),
+                             question_df.reset_index(drop=True)], axis=1)
+    question_df['source'] = question_df['source'].replace('', np.nan)
+
+    # join the catalog by expanding it with the question id category codes
+    info_values = catalog.iloc[question_df['question_id'].cat.codes].reset_index(drop=True)
+    for col in catalog.columns:
+        info_values[col] = info_values[col].astype(catalog[col].dtype)
+    return pd.concat([question_df, info_values], axis=1)
+
+
+@click.command()
+@click.argument('responses', type=click.Path(exists=True))
+@click.option('-f','--config-file', required=True, type=click.Path(exists=True),
+              help='configuration file the study was built from')
+@click.option('-i','--id-var', multiple=True, default=['id'],
+              help='columns that identify a participant, pass each one with the option')
+@click.option('-m','--metadata', multiple=True, default=None,
+              help='question metadata keys to add as columns, pass each one with the option')
+@click.option('-o','--out-name', default=None,
+              help='file name to save to, if not passed responses name with -questions is used')
+@click.option('-t','--out-format', default='parquet', type=click.Choice(['csv','parquet','feather']),
+              help='file type to write, parquet and feather require pyarrow. default parquet')
+def cmd_join_question_catalog(responses, config_file, id_var, metadata, out_name, out_format):
+    '''
+    join the question catalog (figure type, text and metadata) from the study 
+    configuration onto a merged response file, one row per participant and question
+    '''
+    full_config = load_configuration(config_file)
+    try:
+        question_df = join_question_catalog(read_data(responses), full_config, id_var, metadata)
+    except click.ClickException as e:
+        e.message = config_file + ' and ' + responses + ': ' + e.message
+        raise
+
+    if not(out_name):
+        out_name = os.path.splitext(responses)[0] + '-questions'
+    if not(out_name.endswith('.' + out_format)):
+        out_name += '.' + out_format
+    
+    write_data(question_df, out_name, out_format)
+    r,c = question_df.shape
+    click.echo('wrote out ({r},{c}) to {out_name}'.format(out_name=out_name,r=r,c=c))
+
+
+@click.command()
+@click.argument('responses', type=click.Path(exists=True))
+@click.option('-f','--config-file', required=True, type=click.Path(exists=True),
+              help='configuration file the study was built from')
+@click.option('-i','--id-var', multiple=True, default=['id'],
+              help='columns that identify a participant, pass each one with the option')
+@click.option('-m','--metadata', multiple=True, default=None,
+              help='question metadata keys to add as columns, pass each one with the option')
+@click.option('-o','--out-name', default=None,
+              help='file name to save to, if not passed responses name with -long is used')
+@click.option('-t','--out-format', default='csv', type=click.Choice(['csv','parquet','feather']),
+              help='file type to write, parquet and feather require pyarrow. default csv')
+def cmd_reshape_long(responses, config_file, id_var, metadata, out_name, out_format):
+    '''
+    reshape a merged response file (csv, parquet or feather) to one row per participant, 
+    question and variable using the study configuration
+    '''
+    full_config = load_configuration(config_file)
+    long_df = reshape_long(read_data(responses), full_config, id_var, metadata)
+
+    if not(out_name):
+        out_name = os.path.splitext(responses)[0] + '-long'
+    if not(out_name.endswith('.' + out_format)):
+        out_name += '.' + out_format
+    
+    write_data(long_df, out_name, out_format)
+    done_msg = 'wrote out ({r},{c}) to {out_name}'
+    r,c = long_df.shape
+    click.echo(done_msg.format(out_name=out_name,r=r,c=c))
+
+
+def value_keys(values, decimals=6):
+    '''
+    comparable form of logged values, numbers (as text or stored as numbers of any 
+    type) rounded to `decimals` places, anything else as text, missing values stay NaN
+    '''
+    values = pd.Series(values).astype(object)
+    numbers = pd.to_numeric(values, errors='coerce').round(decimals)
+    keys = values.where(values.isna(), values.astype(str)).astype(object)
+    keys[numbers.notna()] = numbers[numbers.notna()]
+    return keys
+
+
+def verify_responses(responses, full_config, id_vars=['id']):
+    '''
+    check every logged value against the values the question's figure can send, 
+    recomputed from the configuration once per question: values a page cannot send are
+    `out_of_domain`, and values that are each possible but not logged together at any 
+    slider step (eg an overlap that is not the overlap at the logged location) are a 
+    `mismatch`. Missing values are not checked
+
+    Parameters
+    ----------
+    responses : DataFrame
+        merged responses, eg from `merge_dir_csvs`
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    id_vars : list of strings
+        columns that identify a participant, kept on every row
+
+    Returns
+    -------
+    problems : DataFrame
+        one row per problem value with the `id_vars`, `question_id`, `column`, `value`, 
+        `expected` (the values logged with the first variable, for a mismatch) and `problem`
+    '''
+    id_vars = [v for v in id_vars if v in responses.columns]
+    out_cols = id_vars + ['question_id', 'column', 'value', 'expected', 'problem']
+    problems = []
+    for q in full_config:
+        figure_type = q.get('figure_type', 'NormalCurveSlider')
+        logging_values = figure_classes[figure_type]().logging_values(**(q.get('figure_values') or {}))
+        # values at the same position in each list are logged together, at one slider step
+        if len(set(len(v) for v in logging_values.values())) == 1:
+            steps = pd.DataFrame(logging_values)
+        else:
+            steps = None
+        kind_values = {k.replace('_var_name', ''): v for k, v in logging_values.items()}
+        kind_values['confirm'] = ['confirmed', 'skip']
+
+        columns = {kind: var for kind, var in question_variables(q).items()
+                   if var in responses.columns and kind in kind_values}
+        if not(columns):
+            continue
+        keys = pd.DataFrame({kind: value_keys(responses[var]).values 
+                             for kind, var in columns.items()}, index=responses.index)
+
+        in_domain = pd.DataFrame(index=responses.index)
+        for kind, var in columns.items():
+            in_domain[kind] = keys[kind].isin(value_keys(kind_values[kind]).tolist())
+            bad = keys[kind].notna() & ~in_domain[kind]
+            if bad.any():
+                flagged = responses.loc[bad, id_vars + [var]].rename(columns={var: 'value'})
+                flagged['column'] = var
+                flagged['expected'] = np.nan
+                flagged['problem'] = 'out_of_domain'
+                problems.append(flagged)
+
+        # values logged together have to be from the same step
+        step_kinds = [k.replace('_var_name', '') for k in logging_values]
+        step_kinds = [k for k in step_kinds if k in columns]
+        if steps is None or len(step_kinds) < 2:
+            continue
+        step_keys = pd.DataFrame({k.replace('_var_name', ''): value_keys(steps[k]).values
+                                  for k in steps.columns})[step_kinds]
+        checked = keys[step_kinds].notna().all(axis=1) & in_domain[step_kinds].all(axis=1)
+        joined = keys.loc[checked, step_kinds].merge(step_keys.drop_duplicates().assign(_step=True),
+                                                     how='left', on=step_kinds)
+        mismatch = checked.copy()
+        mismatch[checked] = joined['_step'].isna().values
+        if mismatch.any():
+            # the values logged with the first variable (eg location) at its step
+            first = step_kinds[0]
+            expected_by_first = step_keys.drop_duplicates(first).set_index(first)
+            expected = expected_by_first.loc[keys.loc[mismatch, first]].astype(str)
+            for kind in step_kinds[1:]:
+                var = columns[kind]
+                flagged = responses.loc[mismatch, id_vars + [var]].rename(columns={var: 'value'})
+                flagged['column'] = var
+                flagged['expected'] = expected[kind].values
+                flagged['problem'] = 'mismatch'
+                problems.append(flagged)
+
+    if not(problems):
+        return pd.DataFrame(columns=out_cols)
+    problems = pd.concat([p.assign(question_id=p['column'].map(
+                              {v: q['question_id'].lower() for q in full_config 
+                               for v in question_variables(q).values()}))
+                          for p in problems])
+    # values of different types (eg numbers and text) are reported as text
+    problems['value'] = problems['value'].astype(str)
+    return problems[out_cols].reset_index(drop=True)
+
+
+@click.command()
+@click.argument('responses', type=click.Path(exists=True))
+@click.option('-f','--config-file', required=True, type=click.Path(exists=True),
+              help='configuration file the study was built from')
+@click.option('-i','--id-var', multiple=True, default=['id'],
+              help='columns that identify a participant, pass each one with the option')
+@click.option('-o','--out-name', default=None,
+              help='csv to save the problems to, if not passed responses name with -problems is used')
+def cmd_verify_responses(responses, config_file, id_var, out_name):
+    '''
+    check the logged values in a merged response file (csv, parquet or feather) against
+    the values each question's figure can send and save any problems to a csv
+    '''
+    full_config = load_configuration(config_file)
+    problems = verify_responses(read_data(responses), full_config, id_var)
+
+    if not(out_name):
+        out_name = os.path.splitext(responses)[0] + '-problems.csv'
+    problems.to_csv(out_name, index=False)
+    counts = problems['problem'].value_counts()
+    click.echo('{o} values out of domain, {m} mismatched, saved to {out_name}'.format(
+                    o=counts.get('out_of_domain', 0), m=counts.get('mismatch', 0),
+                    out_name=out_name))
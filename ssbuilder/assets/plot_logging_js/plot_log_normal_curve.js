@@ -1,17 +1,32 @@
 // get object
 var myPlot = document.getElementById('{question_id}');
 
-// watch the plot, act on changes
-myPlot.on('plotly_afterplot', function () {{
+// write the logged values for a slider step
+//  the values for every step are in the layout meta, set in the python code that generates the plot
+//  this allows the passed value names (that are referenced in the form) to be configured
+function writeStep(step) {{
      // curly braces are escaped for python processeding, thats thwy they are doubled
-    {{
-        // extract the active trace
-        var curTrace = myPlot.data.filter(trace => trace.visible === true);
-        //  assign the values from metadata
-        //  the meta available are set in the python code that generates the plot
-        //  this allows the passed value names (that are referenced in the form) to be configured
-        document.getElementById("{location_var_name}").value = curTrace[1].meta.location;
-        document.getElementById("{overlap_var_name}").value = curTrace[1].meta.overlap;
+    var stepMeta = myPlot.layout.meta;
+    if (step >= 0) {{
+        document.getElementById("{location_var_name}").value = stepMeta.location[step];
+        document.getElementById("{overlap_var_name}").value = stepMeta.overlap[step];
     }}
+}}
+
+// log the starting values once the plot is drawn
+myPlot.once('plotly_afterplot', function () {{
+    writeStep(myPlot.layout.meta.initial);
+}});
+
+// watch the slider, write at most once per frame while it is dragged
+var pendingStep = null;
+myPlot.on('plotly_sliderchange', function (eventData) {{
+    if (pendingStep === null) {{
+        requestAnimationFrame(function () {{
+            writeStep(pendingStep);
+            pendingStep = null;
+        }});
+    }}
+    pendingStep = eventData.slider.active;
 }});
-// curly are escaped for python processeding, thats thwy they are doubled
\ No newline at end of file
+// curly are escaped for python processeding, thats thwy they are doubled
@@ -0,0 +1,35 @@
+// coded pass through variables travel in one parameter, as code.value pairs split by *
+const ssCodes = {query_codes};
+const ssPacked = {{}};
+(searchParams.get('{packed_var}') || '').split('*').forEach(function (pair) {{
+    const cut = pair.indexOf('.');
+    if (cut > 0) {{
+        ssPacked[pair.slice(0, cut)] = decodeURIComponent(pair.slice(cut + 1));
+    }}
+}});
+for (const name in ssCodes) {{
+    if (ssCodes[name] in ssPacked) {{
+        document.getElementById(name).value = ssPacked[ssCodes[name]];
+    }}
+}}
+// on submit pack every coded field into the one parameter and stop sending them separately
+document.querySelector('form').addEventListener('submit', function () {{
+    const pairs = [];
+    new FormData(this).forEach(function (value, name) {{
+        if (name in ssCodes) {{
+            pairs.push(ssCodes[name] + '.' + encodeURIComponent(value).replace(/\*/g, '%2A'));
+        }}
+    }});
+    document.getElementById('{packed_var}').value = pairs.join('*');
+    for (const field of this.elements) {{
+        if (field.name in ssCodes) {{
+            field.disabled = true;
+        }}
+    }}
+}});
+// turn the fields back on if the page is shown again with the back button
+window.addEventListener('pageshow', function () {{
+    for (const field of document.querySelector('form').elements) {{
+        field.disabled = false;
+    }}
+}});
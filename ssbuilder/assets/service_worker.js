@@ -0,0 +1,42 @@
+// generated by ssgeneratehtml, precaches the study pages and shared assets
+//  the cache name changes when the pages do, so a new build replaces the old cache
+// curly braces are escaped for python processeding, thats thwy they are doubled
+const cacheName = '{cache_name}';
+const precacheUrls = {precache_urls};
+
+self.addEventListener('install', function (event) {{
+    // each asset on its own so one failed download does not stop the rest
+    event.waitUntil(caches.open(cacheName).then(function (cache) {{
+        return Promise.all(precacheUrls.map(function (url) {{
+            return cache.add(new Request(url, {{mode: 'cors'}})).catch(function () {{}});
+        }}));
+    }}).then(function () {{
+        return self.skipWaiting();
+    }}));
+}});
+
+self.addEventListener('activate', function (event) {{
+    // remove caches from earlier builds
+    event.waitUntil(caches.keys().then(function (names) {{
+        return Promise.all(names.filter(function (name) {{
+            return name.startsWith('ssbuilder-') && name !== cacheName;
+        }}).map(function (name) {{
+            return caches.delete(name);
+        }}));
+    }}).then(function () {{
+        return self.clients.claim();
+    }}));
+}});
+
+self.addEventListener('fetch', function (event) {{
+    if (event.request.method !== 'GET') {{
+        return;
+    }}
+    // pages are opened with the answers in the query string, so match them without it
+    const matchOptions = {{ignoreSearch: event.request.mode === 'navigate'}};
+    event.respondWith(caches.open(cacheName).then(function (cache) {{
+        return cache.match(event.request, matchOptions).then(function (cached) {{
+            return cached || fetch(event.request);
+        }});
+    }}));
+}});
@@ -0,0 +1,56 @@
+// single page survey: one section per question, only the active one is shown and plotted
+//  this file is inserted as is, not formatted, so the curly braces are not doubled
+var ssSteps = Array.from(document.querySelectorAll('.ss-step'));
+var ssCurrent = 0;
+// answers to later questions would stop the earlier ones submitting, so they are only
+//  required once their question is shown
+var ssRequired = Array.from(document.querySelectorAll('.ss-step [required]'));
+
+function ssShowStep(i) {
+    ssCurrent = i;
+    ssSteps.forEach(function (step, j) {
+        step.hidden = j !== i;
+    });
+    ssRequired.forEach(function (field) {
+        field.required = ssSteps.indexOf(field.closest('.ss-step')) <= i;
+    });
+    // make the plot only now, and start logging it
+    var questionId = ssSteps[i].dataset.question;
+    var figureData = document.getElementById(questionId + '-figure');
+    if (figureData) {
+        // the figure json is in the page or in a shared file named in data-src
+        var loaded = figureData.dataset.src ?
+            fetch(figureData.dataset.src).then(function (response) { return response.json(); }) :
+            Promise.resolve(JSON.parse(figureData.textContent));
+        loaded.then(function (figure) {
+            // skip if the participant moved on while it loaded
+            if (ssCurrent !== i) { return; }
+            var plotDiv = document.getElementById(questionId);
+            plotDiv.innerHTML = '';
+            Plotly.newPlot(plotDiv, {data: figure.data, layout: figure.layout,
+                                     frames: figure.frames, config: {responsive: true}});
+            window.ssPlotLogging[questionId]();
+        });
+    }
+    window.scrollTo(0, 0);
+}
+
+// take down the plot of a finished question, its answers stay in the form fields
+function ssEndStep(i) {
+    var plotDiv = document.getElementById(ssSteps[i].dataset.question + '-figure') &&
+        document.getElementById(ssSteps[i].dataset.question);
+    if (plotDiv) {
+        Plotly.purge(plotDiv);
+        plotDiv.innerHTML = '';
+    }
+}
+
+// each question's submit button moves to the next one, the last sends everything
+document.querySelector('form').addEventListener('submit', function (event) {
+    if (ssCurrent < ssSteps.length - 1) {
+        event.preventDefault();
+        event.stopImmediatePropagation();
+        ssEndStep(ssCurrent);
+        ssShowStep(ssCurrent + 1);
+    }
+});
@@ -0,0 +1,60 @@
+// page timing for the telemetry fields, all times are ms from when the page was opened
+// curly braces are escaped for python processeding, thats thwy they are doubled
+(function () {{
+    var maxValue = {max_value};
+    var firstInteraction = null;
+    var moves = 0;
+    function setField(name, value) {{
+        document.getElementById(name).value = Math.min(Math.round(value), maxValue);
+    }}
+
+    // load time is only final after the load handlers finish
+    window.addEventListener('load', function () {{
+        setTimeout(function () {{
+            var nav = performance.getEntriesByType('navigation')[0];
+            setField('{load_var_name}', nav ? nav.loadEventEnd : performance.now());
+        }}, 0);
+    }});
+
+    // first time plotly finishes drawing the plot, like the plot logging js
+    var plotDiv = document.getElementById('{question_id}');
+    function timePlot() {{
+        plotDiv.once('plotly_afterplot', function () {{
+            setField('{plot_var_name}', performance.now());
+        }});
+    }}
+    if (plotDiv && plotDiv.once) {{
+        // the inline plot is started while the page is parsed, before this runs
+        timePlot();
+    }} else if (plotDiv && window.ssPlotLogging && window.ssPlotLogging['{question_id}']) {{
+        // the plot is drawn later (eg after a static preview), then its logging starts
+        var startLogging = window.ssPlotLogging['{question_id}'];
+        window.ssPlotLogging['{question_id}'] = function () {{
+            timePlot();
+            startLogging();
+        }};
+    }}
+
+    // presses on the slider and the first interaction with the page
+    document.addEventListener('pointerdown', function (event) {{
+        if (firstInteraction === null) {{
+            firstInteraction = performance.now();
+        }}
+        if (event.target.closest && event.target.closest('.slider-container')) {{
+            moves += 1;
+            setField('{moves_var_name}', moves);
+        }}
+    }}, true);
+    document.addEventListener('keydown', function () {{
+        if (firstInteraction === null) {{
+            firstInteraction = performance.now();
+        }}
+    }}, true);
+
+    // filled in before any other submit handler, eg the one that packs the fields
+    document.addEventListener('submit', function () {{
+        if (firstInteraction !== null) {{
+            setField('{answer_var_name}', performance.now() - firstInteraction);
+        }}
+    }}, true);
+}})();
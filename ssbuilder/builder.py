@@ -7,14 +7,24 @@ import numpy as np
 from scipy.stats import norm
 import click
 import yaml
+import json
+import hashlib
+import inspect
+import glob
+import itertools
 import markdown
+import time
 from copy import deepcopy
+from functools import lru_cache
+from urllib.parse import quote, quote_plus
 from importlib.resources import files
 
 # import plot functions here 
 from .single_normal_curve import NormalCurveSlider
 from .tradeoff_questions import TradeoffBar, TradeoffLine
 from .instructions import InstructionQuestion
+from .preview import figure_preview_svg, plotly_script_attributes
+from .sinks import MemorySink, output_sink, archive_sink
 
 # add function handle and a reference name here to add new types
 figure_classes = {'NormalCurveSlider': NormalCurveSlider,
@@ -23,9 +33,10 @@ figure_classes = {'NormalCurveSlider': NormalCurveSlider,
                   'InstructionQuestion': InstructionQuestion}
 
 
+@lru_cache(maxsize=None)
 def load_template_file(*args):
     '''
-    load a template file from the package's template dir
+    load a template file from the package's template dir, each is read once per process
     '''
     template_path = os.path.join(files(__package__), 'assets', *args)
     
@@ -50,6 +61,26 @@ Forwards to: {next_question_url}
 Sends: {send_vars}
 '''
 
+# name of the parameter that carries packed variables, see `assign_query_codes`
+packed_query_var = 'ss'
+
+# service worker file written to the output folder, see `write_service_worker`
+service_worker_file = 'sw.js'
+# folder in the output folder for shared figure json, see `write_figure_asset`
+figure_assets_dir = 'figures'
+# list of the files a build wrote, with their hashes, see `write_manifest`
+manifest_file = 'ss-manifest.json'
+# hidden fields for page timing, see `telemetry_variables`
+telemetry_var_names = {'load': 'tload', 'plot': 'tplot', 'moves': 'tmoves', 'answer': 'tanswer'}
+# largest value the timing fields send, so they are at most 7 characters (~2.8 hours in ms)
+telemetry_max_value = 9999999
+# make_question_page parameters the builder passes for every page, so a question can't set them
+build_page_params = ['out_url', 'out_rel_path', 'debug', 'full_html', 'instructions_type',
+                     'query_codes', 'static_preview', 'survey_step', 'service_worker',
+                     'figure_assets', 'written', 'figure_cache']
+# assets every page loads, besides plotly
+shared_asset_urls = ['https://cdn.jsdelivr.net/npm/bootstrap@4.3.1/dist/css/bootstrap.min.css']
+
 instructions_template = {'log': instruction_template_log,
                          'forward': instruction_template_forward,
                          'minimal': instruction_template_minimal,
@@ -75,7 +106,15 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
                        full_html=True,
                        footer_type='confirm_submit',
                        instructions_type='log',
-                       forward_type = None):
+                       forward_type = None,
+                       query_codes=None,
+                       static_preview=False,
+                       survey_step=False,
+                       service_worker=False,
+                       figure_assets=False,
+                       written=None,
+                       figure_cache=None,
+                       telemetry=False):
     '''
     generate html file
     
@@ -100,8 +139,8 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
     out_html_file : string
         name fo the html file, that will be in the url for the participant 
         if not passed will add ".html" to the questionid
-    out_rel_path : string or file buffer
-        where to write the files. 
+    out_rel_path : string or sink
+        where to write the files, a folder or a sink from `ssbuilder.sinks`
     logging_vars : dictionary
         dictionary of names for the variable types the specific question requires 
     confirm_var_name : string {'confirm'}
@@ -119,6 +158,29 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
         generate a full html page or if False, generate only a segment of the page (eg for combining or embedding)
     footer_type : string {'confirm_submit','next' }
         type of footer to use 'confirm_submit'  or 'next'
+    query_codes : dictionary {None}
+        short codes for variables, from `assign_query_codes`. If passed, coded variables
+        are packed into one `ss` parameter instead of one parameter each
+    static_preview : boolean {False}
+        if True the page shows a static svg of the starting figure and loads plotly and 
+        the interactive figure when the browser is idle or at the first interaction
+    survey_step : boolean {False}
+        if True do not write a page, return the question as a step of a single page
+        survey instead, see `make_survey_page`
+    service_worker : boolean {False}
+        if True the page registers the study service worker, see `write_service_worker`
+    figure_assets : boolean {False}
+        if True write the figure json to a shared file named for its contents, that the 
+        page loads, instead of into the page, see `write_figure_asset`
+    written : dictionary {None}
+        record of the files the build writes, filled in by `write_if_changed`
+    figure_cache : dictionary {None}
+        figures already made in this build, a figure with the same type and values is 
+        reused instead of made again, eg for the variants of a question. Keyed by 
+        `('figure', figure_type, values, logging_vars)` and `('json', ...)` for its json
+    telemetry : boolean {False}
+        if True the page also sends how long it took to load, to plot and to answer and 
+        the number of slider presses, see `telemetry_variables`
     -------
     
     Notes
@@ -150,19 +212,27 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
         else:
             figure_meta = figure_classes[figure_type](logging_vars)
 
-        # generate figure
-        if not (figure_values):
-            figure = figure_meta.generate_figure()
+        # generate figure, once per build for the same figure
+        figure_key = (figure_type, json.dumps(figure_values, sort_keys=True, default=str),
+                      json.dumps(logging_vars, sort_keys=True))
+        if figure_cache is not None and ('figure',) + figure_key in figure_cache:
+            figure = figure_cache[('figure',) + figure_key]
         else:
-            if debug:
-                print(figure_values['num_digits'])
-            figure = figure_meta.generate_figure(**figure_values)
+            if not (figure_values):
+                figure = figure_meta.generate_figure()
+            else:
+                if debug:
+                    print(figure_values['num_digits'])
+                figure = figure_meta.generate_figure(**figure_values)
+            if figure_cache is not None:
+                figure_cache[('figure',) + figure_key] = figure
 
     if var_name_suffix:
         confirm_var_name += '_' + question_id
         logging_vars = {k: v + '_' + question_id for k,
                         v in logging_vars.items()}
-    logging_vars['question_id'] = question_id
+    # a new dictionary, the passed one (eg from the configuration) is not changed
+    logging_vars = dict(logging_vars, question_id=question_id)
         
 
     # current question form elements
@@ -190,12 +260,35 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
     question_form_elements = question_form_html + \
         '\n\n'.join([''] + pass_through_html)
 
+    # page timing fields
+    telemetry_vars = telemetry_variables({'question_id': question_id, 'telemetry': telemetry})
+    if telemetry_vars:
+        telemetry_form_vars = {kind + '_var_name': var for kind, var in telemetry_vars.items()}
+        question_form_elements += '\n\n' + load_template_file('question_form_elements', 
+                                                'form_telemetry.html').format(**telemetry_form_vars)
+
     if debug:
         click.echo('working on js pass through')
         click.echo(pass_through_template_js)
         click.echo(pass_through_vars_sorted)
     
     pass_through_js_list = [pass_through_template_js.format(pass_var_name=ptvar)  for ptvar in pass_through_vars_sorted]
+
+    if query_codes:
+        # pack this page's coded variables into one parameter, others are passed as is
+        own_vars = ([v for k, v in logging_vars.items() if not(k == 'question_id')] + [confirm_var_name] +
+                    list(telemetry_vars.values()))
+        page_codes = {v: query_codes[v] for v in pass_through_vars_sorted + own_vars 
+                      if v in query_codes}
+        question_form_elements += '\n\n' + pass_through_template_html.format(
+                                                    pass_var_name=packed_query_var)
+        packed_template_js = load_template_file('question_form_elements', 'pass_through_packed.js')
+        pass_through_js_list = [pass_through_template_js.format(pass_var_name=ptvar)
+                                for ptvar in pass_through_vars_sorted if not(ptvar in page_codes)]
+        pass_through_js_list.append(packed_template_js.format(
+                                        query_codes=json.dumps(page_codes, sort_keys=True),
+                                        packed_var=packed_query_var))
+
     pass_through_js =  '\n'.join([''] + pass_through_js_list)
     
     if debug:
@@ -233,11 +326,50 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
         logging_js = load_template_file('plot_logging_js',figure_meta.plot_logging_js )
         plot_logging_js = logging_js.format(**logging_vars)
 
-        plot_html = figure.to_html(
-            include_plotlyjs='cdn', full_html=False, div_id=question_id, auto_play=False)
+        if static_preview or survey_step or figure_assets:
+            # the figure is drawn later, so the logging starts from the page js
+            plot_logging_js = ('window.ssPlotLogging = window.ssPlotLogging || {};\n' +
+                               f"window.ssPlotLogging['{question_id}'] = function () {{\n" + 
+                               plot_logging_js + '\n};')
+            # keep the json from closing the script tag
+            if figure_cache is not None and ('json',) + figure_key in figure_cache:
+                figure_json = figure_cache[('json',) + figure_key]
+            else:
+                figure_json = figure.to_json().replace('</', '<\\/')
+                if figure_cache is not None:
+                    figure_cache[('json',) + figure_key] = figure_json
+            figure_src = ''
+            if figure_assets:
+                asset_path = write_figure_asset(figure_json, out_rel_path, written)
+                page_root = relative_root(get_page_path(out_html_file, pretty_url))
+                figure_src = f' data-src="{page_root + asset_path}"'
+                figure_json = ''
+            plot_html = load_template_file('plot_deferred.html').format(
+                question_id=question_id,
+                preview_svg=figure_preview_svg(figure) if static_preview else '',
+                figure_json=figure_json, figure_src=figure_src)
+            # a survey step is plotted by the survey js
+            if not(survey_step):
+                plotly_src, plotly_integrity = plotly_script_attributes()
+                plot_html += load_template_file('plot_hydrate.html').format(
+                    question_id=question_id,
+                    plotly_src=plotly_src, plotly_integrity=plotly_integrity,
+                    # with a preview there is something to see, so wait for the page 
+                    load_on='idle' if static_preview else 'now')
+        else:
+            plot_html = figure.to_html(
+                include_plotlyjs='cdn', full_html=False, div_id=question_id, auto_play=False)
     
+    if telemetry_vars:
+        plot_logging_js += '\n' + load_template_file('telemetry.js').format(
+                                    question_id=question_id, max_value=telemetry_max_value,
+                                    **telemetry_form_vars)
+
     # combine all template variables for overall page
     page_info = {'page_title': page_title,
+                 'head_html': head_html(get_page_path(out_html_file, pretty_url), 
+                                        next_question_url if forward_type == 'internal' else None,
+                                        service_worker),
                  'next_question_url': next_question_url,
                  'question_form_elements': question_form_elements,
                  'pass_through_js': pass_through_js,
@@ -247,6 +379,12 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
                  'plot_logging_js': plot_logging_js}
     if debug: 
         click.echo(page_info)
+
+    if survey_step:
+        # pass through variables are handled once for the whole survey page
+        page_info['question_id'] = question_id
+        page_info['question_form_elements'] = question_form_html
+        return load_template_file('survey_step.html').format(**page_info)
         
     if full_html:
         page_template = load_template_file('page.html')
@@ -257,26 +395,18 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
     page_html = page_template.format(**page_info)
 
     # format the final path
-    if pretty_url:
-        subdir = out_html_file[:-5]
-        out_html_file = os.path.join(subdir, 'index.html')
-    else:
-        out_html_file = os.path.join(out_html_file)
-
-    # prepend out directory if provded
-    if out_rel_path:
-        out_path = os.path.join(out_rel_path, out_html_file)
-    else:
-        out_path = out_html_file
+    out_html_file = get_page_path(out_html_file, pretty_url)
 
-    # Write the page
-    with open(out_path, 'w') as f:
-        f.write(page_html)
+    # Write the page, if it is new or different
+    write_if_changed(page_html, out_html_file, out_rel_path, written)
 
     # this is for the user
     #    notebook exmaples print it as markdown
     #    config generator captures into a file
-    send_vars = pass_through_vars_sorted + sorted(list(logging_vars.values()))
+    send_vars = pass_through_vars_sorted + sorted(list(logging_vars.values()) + 
+                                                  list(telemetry_vars.values()))
+    if query_codes:
+        send_vars = [v for v in pass_through_vars_sorted if not(v in query_codes)] + [packed_query_var]
     settings_vars = {'send_vars':send_vars,
                      'out_html_file': out_html_file,
                      'next_question_url': next_question_url,
@@ -291,6 +421,282 @@ def make_question_page(question_id, figure_type='NormalCurveSlider', figure_valu
     instructions = instructions_template[instructions_type].format(**settings_vars)
     return instructions
 
+def head_html(page_path, prefetch_url=None, service_worker=False):
+    '''
+    extra elements for a page's head: the service worker registration and a prefetch
+    hint for the next page. The page is opened with the answers in its query string, 
+    so the prefetched copy is only used through the service worker, which matches 
+    pages without the query
+
+    Parameters
+    ----------
+    page_path : string
+        path of the page in the output folder, from `get_page_path`
+    prefetch_url : string {None}
+        url of the page participants go to next, if it is part of the study, only used
+        with the service worker
+    service_worker : boolean {False}
+        if True register the study service worker and prefetch the next page
+
+    Returns
+    -------
+    head_html : string
+    '''
+    head = []
+    if prefetch_url and service_worker:
+        head.append(f'<link rel="prefetch" href="{prefetch_url}">')
+    if service_worker:
+        # the worker is at the top of the output folder
+        head.append(load_template_file('service_worker_register.html').format(
+                        service_worker_url=relative_root(page_path) + service_worker_file).strip())
+    return ''.join('\n    ' + h for h in head)
+
+def relative_root(page_path):
+    '''
+    relative url from a page to the top of the output folder, eg `../` for pretty urls
+
+    Parameters
+    ----------
+    page_path : string
+        path of the page in the output folder, from `get_page_path`
+    '''
+    page_dir = os.path.dirname(page_path)
+    return '../' * len(page_dir.split(os.sep)) if page_dir else ''
+
+def write_if_changed(content, file_path, out_rel_path=None, written=None):
+    '''
+    write a built file only if it is new or its contents differ from the file there, so
+    unchanged files keep their modification time and sync tools skip them
+
+    Parameters
+    ----------
+    content : string
+        text of the file
+    file_path : string
+        path of the file in the output folder
+    out_rel_path : string or sink
+        output folder or a sink from `ssbuilder.sinks`
+    written : dictionary {None}
+        record of the build, the file's sha256 hash and status are added under its path, 
+        see `write_manifest`
+
+    Returns
+    -------
+    status : string {'added', 'changed', 'unchanged'}
+    '''
+    new_bytes = content.encode('utf-8')
+    new_hash = hashlib.sha256(new_bytes).hexdigest()
+    status = output_sink(out_rel_path).write(file_path, new_bytes)
+
+    # shared files are written by many pages, the first write says what happened
+    record_path = file_path.replace(os.sep, '/')
+    if written is not None and not(record_path in written):
+        written[record_path] = {'sha256': new_hash, 'status': status}
+    return status
+
+def write_manifest(written, out_rel_path=None):
+    '''
+    write `ss-manifest.json` to the output folder, listing every file the build wrote 
+    with its hash and which were added, changed or removed since the last build, so 
+    deploy steps can upload only those. Removed files are the ones in the previous 
+    manifest that this build did not write, they are listed but left in place
+
+    Parameters
+    ----------
+    written : dictionary
+        record filled in by `write_if_changed` during the build
+    out_rel_path : string or sink
+        output folder or a sink from `ssbuilder.sinks`
+
+    Returns
+    -------
+    manifest : dictionary
+        `files` with the hash of each file and lists of the `added`, `changed`, 
+        `removed` and `unchanged` files
+    '''
+    previous_manifest = output_sink(out_rel_path).read(manifest_file)
+    previous_files = json.loads(previous_manifest).get('files', {}) if previous_manifest else {}
+
+    manifest = {'files': {path: written[path]['sha256'] for path in sorted(written)}}
+    for status in ['added', 'changed', 'unchanged']:
+        manifest[status] = [path for path in sorted(written) if written[path]['status'] == status]
+    manifest['removed'] = sorted(path for path in previous_files if not(path in written))
+
+    write_if_changed(json.dumps(manifest, indent=2), manifest_file, out_rel_path)
+    return manifest
+
+def write_figure_asset(figure_json, out_rel_path=None, written=None):
+    '''
+    write a figure's json to the shared figures folder, named for a hash of the contents, 
+    so each distinct figure is written once and browsers can cache it across pages
+
+    Parameters
+    ----------
+    figure_json : string
+        the figure as json, eg from `figure.to_json()`
+    out_rel_path : string or sink
+        output folder or a sink from `ssbuilder.sinks`
+    written : dictionary {None}
+        record of the build, see `write_if_changed`
+
+    Returns
+    -------
+    asset_path : string
+        url of the file relative to the output folder
+    '''
+    asset_path = (figure_assets_dir + '/' + 
+                  hashlib.sha256(figure_json.encode('utf-8')).hexdigest()[:16] + '.json')
+    write_if_changed(figure_json, asset_path, out_rel_path, written)
+    return asset_path
+
+def write_service_worker(page_paths, out_rel_path=None, extra_urls=[], written=None):
+    '''
+    write a service worker that precaches the study's pages and shared assets and 
+    serves them from the cache, the cache is named for the page contents so a new build 
+    replaces it
+
+    Parameters
+    ----------
+    page_paths : list of strings
+        paths of the built pages in the output folder, from `get_page_path`
+    out_rel_path : string or sink
+        output folder, the worker is written at its top, or a sink from `ssbuilder.sinks`
+    extra_urls : list of strings
+        other urls to cache, eg the plotly cdn script
+    written : dictionary {None}
+        record of the build, see `write_if_changed`
+
+    Returns
+    -------
+    cache_name : string
+        name of the cache the worker uses
+    '''
+    sink = output_sink(out_rel_path)
+    page_hash = hashlib.sha256()
+    page_urls = []
+    for page_path in page_paths:
+        page_hash.update(sink.read(page_path))
+        # pretty urls are opened as the folder
+        url_path = page_path.replace(os.sep, '/')
+        if url_path.endswith('/index.html'):
+            url_path = url_path[:-len('index.html')]
+        page_urls.append('./' + url_path)
+
+    cache_name = 'ssbuilder-' + page_hash.hexdigest()[:12]
+    worker_js = load_template_file('service_worker.js').format(
+                    cache_name=cache_name,
+                    precache_urls=json.dumps(page_urls + list(extra_urls), indent=4))
+    write_if_changed(worker_js, service_worker_file, sink, written)
+
+    return cache_name
+
+def make_survey_page(chain, study_pass_through_vars=['id'], out_url=None, out_rel_path=None,
+                     debug=False, instructions_type='log', query_codes=None, 
+                     static_preview=False, service_worker=False, figure_assets=False,
+                     written=None, figure_cache=None):
+    '''
+    generate one html file that asks a chain of questions in turn, each question is a 
+    step of the page and its plot is only made while it is shown. The answers are kept 
+    in the page and sent together to the last question's `next_question_url`
+
+    Parameters
+    ----------
+    chain : list of dictionaries
+        page builder parameters of each question in order, eg from `question_chains`
+    study_pass_through_vars : list of strings
+        variables passed in from the url and sent on at the end
+    out_url : string
+        url of the hosted site, for the instructions
+    out_rel_path : string or sink
+        where to write the file, it is named for the first question
+    instructions_type : string {'log','forward','minimal'}
+        format of the returned instructions
+    query_codes : dictionary {None}
+        short codes for variables, from `assign_query_codes`, to pack the answers into 
+        one `ss` parameter
+    static_preview : boolean {False}
+        if True each question shows a static svg of its figure until it is plotted
+    service_worker : boolean {False}
+        if True the page registers the study service worker, see `write_service_worker`
+    figure_assets : boolean {False}
+        if True the figures are loaded from shared files, see `write_figure_asset`
+    written : dictionary {None}
+        record of the build, see `write_if_changed`
+    figure_cache : dictionary {None}
+        figures already made in this build, see `make_question_page`
+
+    Returns
+    -------
+    instructions : string
+        instructions for the survey page, as from `make_question_page`
+    '''
+    first = chain[0]
+    last = chain[-1]
+    if any(q.get('telemetry') for q in chain):
+        raise click.UsageError('telemetry is measured per page, it cannot be used in single page surveys')
+    steps_html = [make_question_page(**q, out_url=out_url, out_rel_path=out_rel_path,
+                                     debug=debug, static_preview=static_preview,
+                                     survey_step=True, figure_assets=figure_assets,
+                                     written=written, figure_cache=figure_cache)
+                  for q in chain]
+
+    # variables from the url, then the answers to every question
+    pass_through_vars = sorted(study_pass_through_vars)
+    own_vars = [v for q in chain for v in question_variables(q).values()]
+
+    pass_through_template_html = load_template_file('question_form_elements','pass_through_var.html')
+    pass_through_template_js = load_template_file('question_form_elements', 'pass_through_parse.js')
+    pass_through_html = [pass_through_template_html.format(pass_var_name=ptvar)
+                         for ptvar in pass_through_vars if not(ptvar == 'id')]
+    page_codes = {}
+    if query_codes:
+        page_codes = {v: query_codes[v] for v in pass_through_vars + own_vars if v in query_codes}
+        pass_through_html.append(pass_through_template_html.format(pass_var_name=packed_query_var))
+    pass_through_js_list = [pass_through_template_js.format(pass_var_name=ptvar)
+                            for ptvar in pass_through_vars if not(ptvar in page_codes)]
+    if query_codes:
+        packed_template_js = load_template_file('question_form_elements', 'pass_through_packed.js')
+        pass_through_js_list.append(packed_template_js.format(
+                                        query_codes=json.dumps(page_codes, sort_keys=True),
+                                        packed_var=packed_query_var))
+
+    # plotly is only needed if some question has a plot
+    plotly_script = ''
+    if any(q.get('figure_type', 'NormalCurveSlider') != 'InstructionQuestion' for q in chain):
+        plotly_src, plotly_integrity = plotly_script_attributes()
+        plotly_script = ('<script type="text/javascript">window.PlotlyConfig = {MathJaxConfig: \'local\'};</script>\n'
+                         f'<script charset="utf-8" src="{plotly_src}" integrity="{plotly_integrity}" '
+                         'crossorigin="anonymous"></script>')
+
+    # the page replaces the first question's page
+    out_html_file = question_page_path(first)
+
+    page_info = {'page_title': first.get('page_title', 'Normal Curve Question'),
+                 'head_html': head_html(out_html_file, service_worker=service_worker),
+                 'next_question_url': last['next_question_url'],
+                 'pass_through_html': '\n\n'.join(pass_through_html),
+                 'steps_html': '\n\n'.join(steps_html),
+                 'plotly_script': plotly_script,
+                 'survey_js': load_template_file('survey_steps.js'),
+                 'pass_through_js': '\n'.join(pass_through_js_list)}
+    page_html = load_template_file('survey_page.html').format(**page_info)
+
+    write_if_changed(page_html, out_html_file, out_rel_path, written)
+
+    send_vars = pass_through_vars + own_vars
+    if query_codes:
+        send_vars = [v for v in pass_through_vars if not(v in query_codes)] + [packed_query_var]
+    settings_vars = {'send_vars': send_vars,
+                     'out_html_file': out_html_file,
+                     'next_question_url': last['next_question_url'],
+                     'out_url': out_url}
+    if not(instructions_type) == 'log':
+        instruction_by_fwd = {'internal':'minimal',
+                              'external':instructions_type}
+        instructions_type = instruction_by_fwd[last['forward_type']]
+
+    return instructions_template[instructions_type].format(**settings_vars)
+
 def set_pass_through(config_dict_list,
                      study_default_pt_vars=['id'], debug=False):
     '''
@@ -302,13 +708,20 @@ def set_pass_through(config_dict_list,
         dictionary with parameters of the page builder as keys
     study_default_pt_vars : list
         list of variables that all questions pass through
+
+    Returns
+    -------
+    parsed_config : list of dictionaries
+        copies of the questions with `pass_through_vars`, `next_question_url` and 
+        `forward_type` set
     '''
     if debug:
         click.echo('pass through')
     
-    # note in this function we rely on that dictionaries are not copied
+    # copy each question so the passed configuration is not changed, the values that
+    # are set are new objects, so a shallow copy is enough
     # set question_id as keys for better indexing
-    conf_qid = {d['question_id']: d for d in config_dict_list}
+    conf_qid = {d['question_id']: dict(d) for d in config_dict_list}
     
     question_ids = [d['question_id'] for d in config_dict_list]
 
@@ -361,16 +774,20 @@ def set_pass_through(config_dict_list,
                 click.echo('forwards to ')
                 click.echo(next_question)
             # extract pass through vars and confirm if needed
-            if conf_qid[q_id]['logging_vars']:
-                cur_question_vars = list(conf_qid[q_id]['logging_vars'].values())
-                cur_confirm = conf_qid[q_id]['confirm_var_name']
-                # var_name_suffix is defaulted to True in the make page, so same behavior here
-                #  if not passed at all or manually set to true
-                if not ('var_name_suffix' in conf_qid[q_id].keys()) or conf_qid[q_id]['var_name_suffix']:
-                    cur_confirm += '_' + conf_qid[q_id]['question_id'].lower()
-                    cur_question_vars = [qv + '_' + conf_qid[q_id]['question_id'].lower()
-                                        for qv in cur_question_vars]
-                cur_q_vars = [cur_confirm] + cur_question_vars
+            if conf_qid[q_id]['logging_vars'] or conf_qid[q_id].get('telemetry'):
+                cur_q_vars = []
+                if conf_qid[q_id]['logging_vars']:
+                    cur_question_vars = list(conf_qid[q_id]['logging_vars'].values())
+                    cur_confirm = conf_qid[q_id]['confirm_var_name']
+                    # var_name_suffix is defaulted to True in the make page, so same behavior here
+                    #  if not passed at all or manually set to true
+                    if not ('var_name_suffix' in conf_qid[q_id].keys()) or conf_qid[q_id]['var_name_suffix']:
+                        cur_confirm += '_' + conf_qid[q_id]['question_id'].lower()
+                        cur_question_vars = [qv + '_' + conf_qid[q_id]['question_id'].lower()
+                                            for qv in cur_question_vars]
+                    cur_q_vars = [cur_confirm] + cur_question_vars
+                # page timing fields, see `telemetry_variables`
+                cur_q_vars += list(telemetry_variables(conf_qid[q_id]).values())
                 # append current pass throughs if they exist
                 if 'pass_through_vars' in conf_qid[q_id]:
                     if debug:
@@ -417,6 +834,48 @@ def set_pass_through(config_dict_list,
     return list(conf_qid.values())
 
 
+def question_chains(parsed_config):
+    '''
+    group questions that forward to each other into chains, in the order participants
+    see them
+
+    Parameters
+    ----------
+    parsed_config : list of dictionaries
+        page builder parameters of every question, after `set_pass_through`
+
+    Returns
+    -------
+    chains : list of lists of dictionaries
+        one list per chain, each starts with a question no other question forwards to
+    '''
+    file_name = lambda q: get_file_name(out_html_file=q.get('out_html_file'),
+                                        question_id=q['question_id'])
+    next_file = lambda q: (get_file_name(out_html_file=q['next_question_url'])
+                           if q.get('forward_type') == 'internal' else None)
+    file_question = {file_name(q): q for q in parsed_config}
+    targets = [next_file(q) for q in parsed_config if next_file(q)]
+    merged = sorted(set(t for t in targets if targets.count(t) > 1))
+    if merged:
+        raise click.ClickException('questions forwarded to from more than one question '
+                                   'cannot be in a single page survey: ' + ', '.join(merged))
+
+    chains = []
+    chained = []
+    # start from questions nothing forwards to, then anything left (eg a loop)
+    starts = [q for q in parsed_config if not(file_name(q) in targets)] + parsed_config
+    for q in starts:
+        chain = []
+        while q is not None and not(q['question_id'] in chained):
+            chain.append(q)
+            chained.append(q['question_id'])
+            q = file_question.get(next_file(q))
+        if chain:
+            chains.append(chain)
+
+    return chains
+
+
 def get_file_name(question_dict = None, out_html_file=None, question_id = None):
     '''
     get the file name for a question from feild with processing or question id
@@ -457,6 +916,37 @@ def get_file_name(question_dict = None, out_html_file=None, question_id = None):
 
     return out_html_file
 
+def get_page_path(out_html_file, pretty_url=False):
+    '''
+    get the path of a built page relative to the output folder
+
+    Parameters
+    ----------
+    out_html_file : string
+        cleaned file name, from `get_file_name`
+    pretty_url : boolean {False}
+        if True the page is `name/index.html` instead of `name.html`
+
+    Returns
+    -------
+    page_path : string
+        relative path of the page
+    '''
+    if pretty_url:
+        subdir = out_html_file[:-5]
+        return os.path.join(subdir, 'index.html')
+    else:
+        return os.path.join(out_html_file)
+
+def question_page_path(question_dict):
+    '''
+    get the path of a question's page relative to the output folder, from its page builder
+    parameters, see `get_page_path`
+    '''
+    return get_page_path(get_file_name(out_html_file=question_dict.get('out_html_file'),
+                                       question_id=question_dict['question_id']),
+                         question_dict.get('pretty_url', False))
+
 def expand_shared_params(loaded_config,debug=False):
     question_template = loaded_config['shared']
     question_unique = loaded_config['unique']
@@ -470,9 +960,9 @@ def expand_shared_params(loaded_config,debug=False):
     # make copies of template for each real question
     full_config = [deepcopy(question_template) for q in question_unique]
 
-    # update each question
+    # update each question, from copies so the loaded configuration is not changed
     # full_config = []
-    for q_i,c_i in zip(question_unique,full_config):
+    for q_i,c_i in zip(deepcopy(question_unique),full_config):
         # c_i = question_template.copy()
         
         for nested_param in nested_parameters:
@@ -490,8 +980,664 @@ def expand_shared_params(loaded_config,debug=False):
     return full_config
 
 
+def load_configuration(config_file, debug=False):
+    '''
+    load a configuration file and expand shared parameters if used
+
+    Parameters
+    ----------
+    config_file : string
+        path to the yaml configuration file
+    debug : bool
+        print debuggin information or not
+
+    Returns
+    -------
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question
+    '''
+    with open(config_file, 'r') as f:
+        # the C loader if pyyaml was built with libyaml, it reads big studies much faster
+        loaded_config = yaml.load(f, Loader=getattr(yaml, 'CLoader', yaml.Loader))
+
+    # ------------------------------------------------------------------------  
+    #   process shared params if provided
+    if type(loaded_config) == list:
+         
+        # pass as is
+        full_config = loaded_config
+    elif 'shared' in loaded_config.keys():
+        full_config = expand_shared_params(loaded_config,debug)
+    else:
+        full_config = loaded_config['unique']
+
+    if type(loaded_config) == dict and 'variants' in loaded_config:
+        full_config = expand_variants(full_config, loaded_config['variants'], debug)
+
+    return full_config
+
+
+def expand_variants(full_config, variants, debug=False):
+    '''
+    copy questions for each counterbalanced order and combination of condition levels,
+    each variant is its own chain of pages, named for the variant
+
+    Parameters
+    ----------
+    full_config : list of dictionaries
+        questions, after `expand_shared_params`
+    variants : dictionary
+        `orders` a dictionary of order names and the question ids in the order they are
+        asked (or a list of orders, named o1, o2, ...), and `conditions`, a dictionary of 
+        factors, each a dictionary of levels with the parameters each level changes, by 
+        question id. Either can be left out. Without orders every question is copied for 
+        each condition and forwards between questions are kept
+
+    Returns
+    -------
+    variant_config : list of dictionaries
+        the copied questions, with question ids `<question_id>-<variant>`, then any 
+        questions not in an order. Each copy's metadata has the `variant`, `order`, each 
+        condition factor's level and its `base_question_id`
+
+    Notes
+    -----
+    the last question of an order forwards to its own `next_question_url`, forwards 
+    to questions that are not copied for the variant are kept, so variants can end at a 
+    shared question or outside of the study
+    '''
+    base = {q['question_id']: q for q in full_config}
+    orders = variants.get('orders', None)
+    if orders is None:
+        orders = {'': [q['question_id'] for q in full_config]}
+    elif type(orders) == list:
+        orders = {'o' + str(i + 1): order for i, order in enumerate(orders)}
+    conditions = variants.get('conditions', {}) or {}
+
+    unknown = sorted(set(qid for order in orders.values() for qid in order) - set(base))
+    unknown += sorted(set(qid for levels in conditions.values() for changes in levels.values()
+                          for qid in changes) - set(base))
+    if unknown:
+        raise click.ClickException('variants use questions not in the configuration: ' + 
+                                   ', '.join(unknown))
+
+    variant_config = []
+    for order_name, order in orders.items():
+        for levels in itertools.product(*[list(f_levels) for f_levels in conditions.values()]):
+            variant = '-'.join([n for n in [order_name] + list(levels) if n])
+            if debug:
+                click.echo('variant ' + variant)
+            copies = {qid: deepcopy(base[qid]) for qid in order}
+            for factor, level in zip(conditions, levels):
+                for qid, changes in conditions[factor][level].items():
+                    if not(qid in copies):
+                        continue
+                    # nested parameters are updated like shared ones
+                    for param, value in changes.items():
+                        if type(value) == dict and type(copies[qid].get(param)) == dict:
+                            copies[qid][param] = copies[qid][param] | value
+                        else:
+                            copies[qid][param] = deepcopy(value)
+
+            for i, qid in enumerate(order):
+                q = copies[qid]
+                if variants.get('orders', None) is not None and i + 1 < len(order):
+                    q['next_question_url'] = order[i + 1]
+                if q.get('next_question_url') in copies:
+                    q['next_question_url'] += '-' + variant if variant else ''
+                q['question_id'] = qid + ('-' + variant if variant else '')
+                # copies write their own pages
+                if q.get('out_html_file') and variant:
+                    q['out_html_file'] = get_file_name(out_html_file=q['out_html_file'])[:-5] + '-' + variant
+                q['metadata'] = dict(q.get('metadata') or {}, variant=variant, 
+                                     order=order_name, base_question_id=qid,
+                                     **dict(zip(conditions, levels)))
+                variant_config.append(q)
+
+    ordered = set(qid for order in orders.values() for qid in order)
+    kept = [q for q in full_config if not(q['question_id'] in ordered)]
+    into_variants = [q['question_id'] + ' to ' + q['next_question_url'] for q in kept 
+                     if q.get('next_question_url') in ordered]
+    if into_variants:
+        raise click.ClickException('questions forward to questions that are copied for each '
+                                   'variant, add them to the orders: ' + ', '.join(into_variants))
+    return variant_config + kept
+
+
+def question_variables(question_dict):
+    '''
+    get the names of the variables a question page sends, the same way 
+    `make_question_page` names them
+
+    Parameters
+    ----------
+    question_dict : dictionary
+        parameters of the page builder for one question
+
+    Returns
+    -------
+    variables : dictionary
+        variable kind (eg `location`, `overlap`, `confirm`) as keys and the variable 
+        name that is sent as values
+    '''
+    question_id = question_dict['question_id'].replace('/', '').replace(' ', '-').lower()
+    figure_type = question_dict.get('figure_type', 'NormalCurveSlider')
+    logging_vars = question_dict.get('logging_vars')
+    if not (logging_vars):
+        logging_vars = figure_classes[figure_type]().logging_vars
+
+    variables = {k.replace('_var_name', ''): v for k, v in logging_vars.items()}
+    # only the confirm_submit footer has the confirm buttons
+    if question_dict.get('footer_type', 'confirm_submit') == 'confirm_submit':
+        variables['confirm'] = question_dict.get('confirm_var_name') or 'confirm'
+
+    if question_dict.get('var_name_suffix', True):
+        variables = {k: v + '_' + question_id for k, v in variables.items()}
+    variables.update(telemetry_variables(question_dict))
+
+    return variables
+
+
+def telemetry_variables(question_dict):
+    '''
+    names of the page timing fields a question page sends if it has `telemetry` on: 
+    when the page finished loading (`load`), when the plot was first drawn (`plot`), 
+    the number of presses on the slider (`moves`) and the time from the first 
+    interaction to submitting (`answer`), times are in ms
+
+    Parameters
+    ----------
+    question_dict : dictionary
+        parameters of the page builder for one question
+
+    Returns
+    -------
+    variables : dictionary
+        kind as keys and variable names, always with the question id, as values, empty 
+        if telemetry is off
+    '''
+    if not(question_dict.get('telemetry', False)):
+        return {}
+    question_id = question_dict['question_id'].replace('/', '').replace(' ', '-').lower()
+    return {kind: name + '_' + question_id for kind, name in telemetry_var_names.items()}
+
+
+def question_value_domains(question_dict, logged_values=True):
+    '''
+    all of the values, as text, that each variable of a question page can send
+
+    Parameters
+    ----------
+    question_dict : dictionary
+        parameters of the page builder for one question
+    logged_values : bool {True}
+        if False the values the figure logs are not computed (that can read its data 
+        files), only the confirm and telemetry values are returned
+
+    Returns
+    -------
+    domains : dictionary
+        variable names (as from `question_variables`) as keys and lists of values, only
+        for the variables the figure logs
+    '''
+    figure_type = question_dict.get('figure_type', 'NormalCurveSlider')
+    figure_values = question_dict.get('figure_values') or {}
+    kind_values = {}
+    if logged_values:
+        logging_values = figure_classes[figure_type]().logging_values(**figure_values)
+        kind_values = {k.replace('_var_name', ''): v for k, v in logging_values.items()}
+    # values from the footer_confirm_submit.html radio buttons
+    kind_values['confirm'] = ['confirmed', 'skip']
+    # timing fields are whole numbers, capped in telemetry.js
+    for kind in telemetry_var_names:
+        kind_values[kind] = ['-1', str(telemetry_max_value)]
+
+    # logging_vars the figure does not log (eg an overlap from shared logging_vars on a 
+    #  tradeoff question) have no known values, `url_lengths` counts them as `id_length`
+    return {var_name: kind_values[kind]
+            for kind, var_name in question_variables(question_dict).items()
+            if kind in kind_values}
+
+
+def assign_query_codes(parsed_config, study_pass_through_vars=['id']):
+    '''
+    give every variable sent between pages a short code, so they can be packed 
+    into one parameter. Study pass through variables (eg id) are not coded, so they
+    are still sent as their own parameters
+
+    Parameters
+    ----------
+    parsed_config : list of dictionaries
+        questions after `set_pass_through`
+    study_pass_through_vars : list of strings
+        variables that all questions pass through
+
+    Returns
+    -------
+    query_codes : dictionary
+        variable names as keys and codes (base 36 numbers, in order of name) as values
+    '''
+    coded_vars = set()
+    for q in parsed_config:
+        coded_vars.update(q.get('pass_through_vars', []))
+        coded_vars.update(question_variables(q).values())
+    coded_vars = sorted(coded_vars - set(study_pass_through_vars))
+
+    return {var: np.base_repr(i, 36).lower() for i, var in enumerate(coded_vars)}
+
+
+def write_query_codes(query_codes, file_name):
+    '''
+    save the codes from `assign_query_codes` so the packed parameter can be expanded
+    after the study, eg with `ssmergedir --query-codes`
+    '''
+    with open(file_name, 'w') as f:
+        json.dump({'packed_var': packed_query_var, 'codes': query_codes}, f, indent=2)
+
+
+def url_lengths(parsed_config, out_url='', id_length=10, query_codes=None, logged_values=True):
+    '''
+    compute the longest url each question page can forward to, from every field 
+    the form sends and all of the values each field can have 
+
+    Parameters
+    ----------
+    parsed_config : list of dictionaries
+        questions after `set_pass_through`
+    out_url : string
+        url the pages are hosted at, used for internal forwards
+    id_length : int {10}
+        length in characters of the id and any other study pass through values
+    query_codes : dictionary {None}
+        codes from `assign_query_codes` if variables are packed
+    logged_values : bool {True}
+        if False the values the figures log are not computed, those variables are 
+        counted as `id_length` characters, see `question_value_domains`
+
+    Returns
+    -------
+    lengths : DataFrame
+        one row per question with the `question_id`, `next_question_url`, number of 
+        `fields` sent, the longest `query_length` and `url_length`
+    '''
+    domains = {}
+    for q in parsed_config:
+        domains.update(question_value_domains(q, logged_values))
+    # widest value of each variable once url encoded
+    #  pass through fields start as 'default' in pass_through_var.html
+    value_width = {var: max(len(quote_plus(v)) for v in values + ['default'])
+                   for var, values in domains.items()}
+    if query_codes:
+        # packed values are escaped like js encodeURIComponent (and *), the pairs like a form
+        packed_width = {var: max(len(quote_plus(code + '.' + quote(v, safe="-_.!~'()")))
+                                 for v in domains.get(var, ['x' * id_length]) + ['default'])
+                        for var, code in query_codes.items()}
+
+    # names are sent by every page after the question, encode each once
+    name_width = lru_cache(maxsize=None)(lambda var: len(quote_plus(var)))
+    rows = []
+    for q in parsed_config:
+        own_vars = question_variables(q)
+        # id is in every page template, others are hidden pass through inputs
+        sent_vars = (['id'] + [ptv for ptv in q.get('pass_through_vars', ['id']) if not(ptv == 'id')]
+                     + list(own_vars.values()))
+        field_lengths = [name_width(var) + 1 + value_width.get(var, id_length)
+                         for var in sent_vars if not(var in (query_codes or {}))]
+        if query_codes:
+            packed_pairs = [packed_width[var] for var in sent_vars if var in query_codes]
+            field_lengths.append(len(packed_query_var) + 1 + sum(packed_pairs) 
+                                 + max(len(packed_pairs) - 1, 0))
+        if q.get('footer_type', 'confirm_submit') == 'confirm_submit':
+            # the named submit button sends the browser's default label, at most 'Submit Query'
+            field_lengths.append(len(quote_plus(q.get('button_text', 'Submit'))) + 1 
+                                 + len('Submit+Query'))
+        query_length = 1 + sum(field_lengths) + len(field_lengths) - 1
+
+        # the form replaces any query already in the action url 
+        next_url = q['next_question_url'].split('?')[0].split('#')[0]
+        if out_url and not('://' in next_url):
+            next_url = out_url + '/' + next_url
+        rows.append([q['question_id'], q['next_question_url'], len(field_lengths),
+                     query_length, len(next_url) + query_length])
+
+    return pd.DataFrame(rows, columns=['question_id', 'next_question_url', 'fields',
+                                       'query_length', 'url_length'])
+
+
+def check_url_lengths(parsed_config, max_url_length=2000, out_url='', id_length=10,
+                      query_codes=None):
+    '''
+    raise an error listing every question that can forward to a url longer than 
+    `max_url_length`, see `url_lengths`
+
+    Returns
+    -------
+    lengths : DataFrame
+        output of `url_lengths`
+    '''
+    lengths = url_lengths(parsed_config, out_url, id_length, query_codes)
+    too_long = lengths[lengths['url_length'] > max_url_length]
+    if len(too_long):
+        msg = ('these questions can send urls longer than ' + str(max_url_length) + 
+               ' characters, split the study into more surveys:\n' + 
+               too_long.to_string(index=False))
+        raise click.ClickException(msg)
+
+    return lengths
+
+
+def validate_configuration(full_config):
+    '''
+    check every question's parameters against the page builder and its figure type's
+    `generate_figure` signature, without making any figures
+
+    Parameters
+    ----------
+    full_config : list of dictionaries
+        questions as loaded by `load_configuration`
+
+    Returns
+    -------
+    problems : list of strings
+        one message per problem found, empty if the configuration is valid
+    '''
+    page_params = set(inspect.signature(make_question_page).parameters) - set(build_page_params)
+    # set by the builder or only used for the instructions and question csv
+    page_params.update(['metadata'])
+    question_ids = set(c.get('question_id') for c in full_config)
+    problems = []
+    seen_ids = {}
+    seen_pages = {}
+    for i, q in enumerate(full_config):
+        question_id = q.get('question_id')
+        where = 'question ' + str(question_id if question_id else i + 1)
+        if not(question_id):
+            problems.append(where + ': no question_id')
+            continue
+        if question_id in seen_ids:
+            problems.append(where + ': question_id used more than once')
+        seen_ids[question_id] = i
+
+        for param in sorted(set(q) - page_params):
+            if param in build_page_params:
+                problems.append(where + ': ' + param + ' is set by the build options, not '
+                                'per question')
+            else:
+                problems.append(where + ': unknown parameter ' + param)
+
+        # set_pass_through reads these to pass the answers on to the next question
+        if q.get('next_question_url') in question_ids:
+            for param in ['logging_vars', 'confirm_var_name']:
+                if not(param in q):
+                    problems.append(where + ': needs ' + param + ' to forward to question ' + 
+                                    q['next_question_url'])
+
+        page_path = question_page_path(q)
+        if page_path in seen_pages and not(seen_pages[page_path] == question_id):
+            problems.append(where + ': writes the same page as question ' + seen_pages[page_path] 
+                            + ', ' + page_path)
+        seen_pages[page_path] = question_id
+
+        figure_type = q.get('figure_type', 'NormalCurveSlider')
+        if not(figure_type in figure_classes):
+            problems.append(where + ': unknown figure_type ' + str(figure_type) + 
+                            ', use one of ' + ', '.join(figure_classes))
+            continue
+
+        figure_values = q.get('figure_values') or {}
+        signature = inspect.signature(figure_classes[figure_type].generate_figure)
+        params = {k: p for k, p in signature.parameters.items() if not(k == 'self')}
+        takes_any = any(p.kind == p.VAR_KEYWORD for p in params.values())
+        if not(takes_any):
+            for param in sorted(set(figure_values) - set(params)):
+                problems.append(where + ': ' + figure_type + ' has no figure_values parameter ' 
+                                + param)
+        for param, p in params.items():
+            if p.default is p.empty and p.kind == p.POSITIONAL_OR_KEYWORD and not(param in figure_values):
+                problems.append(where + ': ' + figure_type + ' needs figure_values ' + param)
+        # data files are read to make the figure
+        for param, value in figure_values.items():
+            if param.endswith('_file') and not(os.path.isfile(str(value))):
+                problems.append(where + ': ' + param + ' not found, ' + str(value))
+
+    return problems
+
+
+def page_size_estimate(question_dict, full_html=True, md=None):
+    '''
+    estimate the size in bytes of a question's page without making its figure, from the
+    templates, question text and pass through variables the page is built from, and the 
+    size of any data files the figure is made from
+
+    Parameters
+    ----------
+    question_dict : dictionary
+        parameters of the page builder for one question, after `set_pass_through`
+    full_html : bool
+        if False the page is a fragment
+    md : markdown.Markdown {None}
+        converter for the question text, to reuse one for many questions
+
+    Returns
+    -------
+    page_bytes, data_bytes : int
+        bytes of the page other than the figure, and of the figure's data files 
+    '''
+    figure_meta = figure_classes[question_dict.get('figure_type', 'NormalCurveSlider')]()
+    templates = [('page.html',) if full_html else ('fragment.html',),
+                 ('footer_html', 'footer_' + question_dict.get('footer_type', 'confirm_submit') + '.html'),
+                 ('question_form_elements', figure_meta.question_form_elements),
+                 ('plot_logging_js', figure_meta.plot_logging_js)]
+    page_bytes = sum(len(load_template_file(*t).encode('utf-8')) for t in templates)
+    if md is None:
+        md = markdown.Markdown()
+    page_bytes += len(md.reset().convert(question_dict.get('question_text', '')).encode('utf-8'))
+
+    # every variable passed through has an input and a line of js to fill it
+    pass_through_bytes = (len(load_template_file('question_form_elements', 'pass_through_var.html')) + 
+                          len(load_template_file('question_form_elements', 'pass_through_parse.js')))
+    for ptvar in question_dict.get('pass_through_vars', ['id']):
+        page_bytes += pass_through_bytes + 2 * len(ptvar)
+
+    data_bytes = sum(os.path.getsize(str(v)) for k, v in (question_dict.get('figure_values') or {}).items()
+                     if k.endswith('_file') and os.path.isfile(str(v)))
+    return page_bytes, data_bytes
+
+
+def plan_configuration(config_file, study_pass_through_vars=['id'], out_url='', id_length=10,
+                       compact_query=False, full_html=True, debug=False):
+    '''
+    check a configuration and describe the pages it builds without making any figures 
+    or reading their data files: the page each question writes and forwards to, the 
+    variables it sends, the longest url it can forward to and an estimate of its size. 
+    The url lengths count each value the figure logs as `id_length` characters, the 
+    build checks them with the values themselves
+
+    Parameters
+    ----------
+    config_file : string
+        path to the yaml configuration file
+    study_pass_through_vars : list of strings
+        variables that all questions pass through
+    out_url : string
+        url the pages are hosted at, used for the url lengths of internal forwards
+    id_length : int {10}
+        length of the id and any other study pass through values
+    compact_query : bool
+        if True the url lengths are for packed variables, see `assign_query_codes`
+    full_html : bool
+        if False the pages are fragments
+
+    Returns
+    -------
+    plan : DataFrame
+        one row per question, in the order of the configuration
+    '''
+    full_config = load_configuration(config_file, debug)
+    problems = validate_configuration(full_config)
+    if problems:
+        raise click.ClickException(str(len(problems)) + ' problems in ' + config_file + ':\n' +
+                                   '\n'.join(problems))
+
+    parsed_config = set_pass_through(full_config, list(study_pass_through_vars), debug)
+    query_codes = assign_query_codes(parsed_config, study_pass_through_vars) if compact_query else None
+    lengths = url_lengths(parsed_config, out_url, id_length, query_codes, logged_values=False)
+
+    md = markdown.Markdown()
+    rows = []
+    for q in parsed_config:
+        send_vars = sorted(q['pass_through_vars']) + sorted(question_variables(q).values())
+        if query_codes:
+            send_vars = [v for v in sorted(q['pass_through_vars']) if not(v in query_codes)] + [packed_query_var]
+        page_bytes, data_bytes = page_size_estimate(q, full_html, md)
+        rows.append([q['question_id'], q.get('figure_type', 'NormalCurveSlider'), 
+                     question_page_path(q), q['next_question_url'], q.get('forward_type'),
+                     ' '.join(send_vars), page_bytes, data_bytes])
+
+    plan = pd.DataFrame(rows, columns=['question_id', 'figure_type', 'page', 'next_question_url',
+                                       'forward_type', 'send_vars', 'page_bytes', 'data_bytes'])
+    return plan.merge(lengths[['question_id', 'fields', 'url_length']], on='question_id')
+
+
+def build_study(full_config, out_rel_path=None, study_pass_through_vars=['id'], out_url='',
+                study_name=None, debug=False, fragment=False, all_in_one=False, 
+                instructions_type='log', max_url_length=2000, id_length=10, 
+                compact_query=False, static_preview=False, single_page=False, 
+                service_worker=False, figure_assets=False, manifest=False,
+                figure_cache=None):
+    '''
+    build every page of a study to a folder or a sink, this is `ssgeneratehtml` without
+    reading the configuration file or saving the instructions, see 
+    `generate_from_configuration` for the options
+
+    Parameters
+    ----------
+    full_config : list of dictionaries
+        one dictionary of page builder parameters per question, eg from `load_configuration`
+    out_rel_path : string or sink {None}
+        folder to write to or a sink from `ssbuilder.sinks`, eg a `MemorySink` to keep the
+        files in memory or a `ZipSink` for one archive. The sink is closed at the end
+    study_name : string
+        title of the all in one page
+    figure_cache : dictionary {None}
+        figures made by earlier builds, to share them across studies, see 
+        `make_question_page`
+
+    Returns
+    -------
+    build : dictionary
+        `instructions` as markdown, the `query_codes` if `compact_query`, `written` with 
+        the hash and status of every file written (see `write_if_changed`) and the 
+        `manifest` if `manifest`
+    '''
+    if not(type(study_pass_through_vars) ==list):
+        study_pass_through_vars = list(study_pass_through_vars)
+    if all_in_one:
+        fragment=True
+
+    sink = output_sink(out_rel_path)
+
+    # ------------------------------------------------------------------------
+    # parse for pass through vars for sequential questions
+    
+    parsed_config = set_pass_through(full_config,study_pass_through_vars, debug)
+
+    if compact_query:
+        query_codes = assign_query_codes(parsed_config, study_pass_through_vars)
+    else:
+        query_codes = None
+
+    # fail before building if any forward can be too long
+    if max_url_length:
+        check_url_lengths(parsed_config, max_url_length, out_url, id_length, query_codes)
+
+    # remove metadata, from the parsed copies
+    #  could be saved, but if nested it's a dict and nontrival to print for now. 
+    [q.pop('metadata',None) for q in parsed_config]
+
+    # -------------- generate all of the files
+
+    # every file written to the output folder, for the manifest
+    written = {}
+    # figures made so far, shared by questions (eg variants) with the same figure
+    if figure_cache is None:
+        figure_cache = {}
+    
+    if single_page:
+        chains = question_chains(parsed_config)
+        instructions = [make_survey_page(chain, study_pass_through_vars, out_url=out_url,
+                            out_rel_path=sink, debug=debug,
+                            instructions_type=instructions_type, query_codes=query_codes,
+                            static_preview=static_preview, service_worker=service_worker,
+                            figure_assets=figure_assets, written=written,
+                            figure_cache=figure_cache)
+            for chain in chains]
+        page_paths = [question_page_path(chain[0]) for chain in chains]
+    else:
+        instructions = [make_question_page(**q, out_url=out_url, out_rel_path=sink,
+              debug=debug,full_html=not(fragment),instructions_type=instructions_type,
+              query_codes=query_codes, static_preview=static_preview,
+              service_worker=service_worker, figure_assets=figure_assets,
+              written=written, figure_cache=figure_cache) 
+            for q in parsed_config]
+        page_paths = [question_page_path(q) for q in parsed_config]
+
+    # check if end.html is required 
+    #  end.html is an option for the `next_question_url` parameter to send people to a landing
+    # page instead of qualtrics
+    next_url_list = [d['next_question_url'] for d in parsed_config]
+    if 'end.html' in next_url_list:
+        end_html = load_template_file('end.html')
+        write_if_changed(end_html, 'end.html', sink, written)
+        page_paths.append('end.html')
+
+    if service_worker:
+        # shared figures are cached too, their names change with their contents
+        figure_urls = ['./' + path for path in sorted(written) 
+                       if path.startswith(figure_assets_dir + '/')]
+        write_service_worker(page_paths, sink,
+                             figure_urls + shared_asset_urls + [plotly_script_attributes()[0]],
+                             written)
+         
+
+    # merge if appropriate
+    if all_in_one:
+        # extract file names
+        file_list = [get_file_name(question_dict=q) for q in parsed_config]
+        page = load_template_file('page_header.html').format(study_name = study_name)
+        for file_name in file_list:
+            page += sink.read(file_name).decode('utf-8')
+        page += load_template_file('page_footer.html')
+
+        write_if_changed(page, 'aio.html', sink, written)
+
+    build = {'instructions': '\n'.join(instructions) + '\n\n ## Metadata',
+             'query_codes': query_codes,
+             'written': written}
+    if manifest:
+        build['manifest'] = write_manifest(written, sink)
+
+    sink.close()
+    return build
+
+
+def build_files(full_config, **kwargs):
+    '''
+    build a study in memory, see `build_study` for the options
+
+    Returns
+    -------
+    files : dictionary
+        path of each built file in the output folder as keys, contents as bytes as values
+    '''
+    sink = MemorySink()
+    build_study(full_config, sink, **kwargs)
+    return sink.files
+
+
 @click.command()
-@click.option('-f','--config-file')
+@click.option('-f','--config-file', multiple=True,
+              help='configuration file, pass more than one (or a glob) to build them all to folders of -p named for each')
 @click.option('-p', '--out_rel_path')
 @click.option('-r','--repo_name')
 @click.option('-o','--gh_org')
@@ -502,20 +1648,48 @@ def expand_shared_params(loaded_config,debug=False):
 @click.option('-i','--instructions-type', default='forward',
               type=click.Choice(['log','forward','minimal','blank'],
                                 case_sensitive=False))
+@click.option('-l','--max-url-length', default=2000, type=int,
+              help='fail before building if any page can forward to a longer url, 0 to skip the check')
+@click.option('--id-length', default=10, type=int,
+              help='length of the id and other study pass through values for the url length check')
+@click.option('-c','--compact-query', is_flag=True,
+              help='pack variables passed between pages into one short parameter')
+@click.option('-s','--static-preview', is_flag=True,
+              help='show a static image of each figure first and load plotly after the page')
+@click.option('-g','--single-page', is_flag=True,
+              help='put each chain of questions on one page that sends all answers at the end')
+@click.option('-w','--service-worker', is_flag=True,
+              help='write a service worker that caches the study pages for fast, offline moves')
+@click.option('-j','--figure-assets', is_flag=True,
+              help='write each distinct figure once to a shared json file the pages load')
+@click.option('-m','--manifest', is_flag=True,
+              help='write ss-manifest.json listing the files added, changed and removed since the last build')
+@click.option('-z','--archive', default=None,
+              help='write the pages to one .zip or .tar(.gz) archive instead of the output folder')
+@click.option('--plan', is_flag=True,
+              help='check the configuration and list the pages it would build, without building them')
               
 def generate_from_configuration(config_file=None,repo_name=None,
                                 gh_org=None,out_url=None,
                                 debug=False, out_rel_path='',
                                 fragment=False,all_in_one=False,
                                 study_pass_through_vars = ['id'], 
-                                instructions_type='log'):
+                                instructions_type='log',
+                                max_url_length=2000, id_length=10,
+                                compact_query=False, static_preview=False,
+                                single_page=False, service_worker=False,
+                                figure_assets=False, manifest=False, plan=False,
+                                archive=None):
     '''
     Generate html files from a configuration file
 
     Parameters
     ----------
-    config_file : string or None
-        file name, if none, configureation.yml assumed
+    config_file : string, list of strings or None
+        file name, if none, configureation.yml assumed. With more than one file (or a 
+        glob pattern) every study is built in one process, each to a folder of 
+        `out_rel_path` (and url of `out_url`) named for the file, and the data files and
+        figures are shared. The time for each study is printed
     repo_name : string {None}
         name of the repo
     out_url : string {None}
@@ -529,7 +1703,39 @@ def generate_from_configuration(config_file=None,repo_name=None,
     fragment : bool
         generate a fragment or not
     all_in_one : bool
-        merge files to a single htmlfile, this version will not work as as a survey
+        merge files to a single htmlfile, this version will not work as as a survey, see
+        `single_page` for a single page that does
+    max_url_length : int {2000}
+        error before building any pages if any page can forward to a longer url, 
+        0 to skip checking
+    id_length : int {10}
+        length of the id and any other study pass through values, for checking url length
+    compact_query : bool
+        if True give variables short codes and pack them into one parameter, the codes 
+        are saved to a `-query-codes.json` file next to the instructions to expand them
+        after the study
+    static_preview : bool
+        if True pages show a static svg of the starting figure while plotly loads in the 
+        background, see `make_question_page`
+    single_page : bool
+        if True each chain of questions that forward to each other is one page, named 
+        for its first question, see `make_survey_page`
+    service_worker : bool
+        if True write `sw.js` to precache all of the pages and shared assets and register 
+        it on every page, see `write_service_worker`
+    figure_assets : bool
+        if True write each distinct figure once to `figures/<hash>.json` in the output 
+        folder and have pages load it, see `write_figure_asset`
+    manifest : bool
+        if True write `ss-manifest.json` to the output folder with the hash of every 
+        file built and which files were added, changed or removed since the last build, 
+        see `write_manifest`. Files that have not changed are never rewritten
+    plan : bool
+        if True only check the configuration and print the pages it builds, see 
+        `plan_configuration`, nothing is written
+    archive : string {None}
+        file name of a .zip, .tar or .tar.gz archive to write the pages to instead of 
+        `out_rel_path`, see `ssbuilder.sinks`
     '''
     if not(type(study_pass_through_vars) ==list):
         study_pass_through_vars = list(study_pass_through_vars)
@@ -547,71 +1753,170 @@ def generate_from_configuration(config_file=None,repo_name=None,
     if all_in_one:
         fragment=True
 
+    if single_page and fragment:
+        raise click.UsageError('single page surveys are full pages, they cannot be fragments')
+    if service_worker and fragment:
+        raise click.UsageError('the service worker is registered from full pages, not fragments')
+
+    config_files = configuration_files(config_file)
+    # each study of a batch goes to its own folder and url
+    batch = len(config_files) > 1
+    study_names = [os.path.splitext(os.path.basename(f))[0] for f in config_files]
+
+    if plan:
+        plans = []
+        for study, study_file in zip(study_names, config_files):
+            if batch:
+                click.echo('\n' + study_file)
+            study_plan = plan_configuration(study_file, study_pass_through_vars, 
+                                            study_out_url(out_url, study, batch), 
+                                            id_length, compact_query, not(fragment), debug)
+            click.echo(study_plan.to_string(index=False))
+            too_long = (study_plan['url_length'] > max_url_length).sum() if max_url_length else 0
+            click.echo('{n} pages, {e} external forwards, {t} urls over {m} characters'.format(
+                            n=len(study_plan), e=(study_plan['forward_type'] == 'external').sum(),
+                            t=too_long, m=max_url_length))
+            plans.append(study_plan)
+        return plans if batch else plans[0]
+
+    # figures and data files are shared by all of the studies
+    figure_cache = {}
+    timings = []
+    for study, study_file in zip(study_names, config_files):
+        start = time.perf_counter()
+        figures_before = count_cached_figures(figure_cache)
+        study_archive = archive
+        if archive and batch:
+            study_archive = os.path.join(os.path.dirname(archive), 
+                                         study + '-' + os.path.basename(archive))
+
+        build = build_configuration_file(study_file, 
+                    os.path.join(out_rel_path or '', study) if batch else out_rel_path,
+                    study_archive, 
+                    # the default configuration has the default instructions file
+                    instruction_file=None if config_file else 'instructions.md', debug=debug, 
+                    study_pass_through_vars=study_pass_through_vars,
+                    out_url=study_out_url(out_url, study, batch),
+                    study_name=repo_name, fragment=fragment, all_in_one=all_in_one,
+                    instructions_type=instructions_type, max_url_length=max_url_length,
+                    id_length=id_length, compact_query=compact_query, 
+                    static_preview=static_preview, single_page=single_page, 
+                    service_worker=service_worker, figure_assets=figure_assets,
+                    manifest=manifest, figure_cache=figure_cache)
+
+        timings.append([study_file, len(build['written']), 
+                        count_cached_figures(figure_cache) - figures_before,
+                        round(time.perf_counter() - start, 2)])
+
+    if batch:
+        summary = pd.DataFrame(timings, columns=['config_file', 'files', 'figures_made', 'seconds'])
+        click.echo(summary.to_string(index=False))
+        click.echo('built {n} studies in {t:.2f} seconds'.format(n=len(summary), 
+                                                                 t=summary['seconds'].sum()))
+
+
+def study_out_url(out_url, study, batch):
+    '''
+    url of a study's pages, each study of a batch is in its own folder under `out_url`,
+    an empty `out_url` (relative links) stays empty
+    '''
+    if batch and out_url:
+        return out_url + '/' + study
+    return out_url
+
+
+def count_cached_figures(figure_cache):
+    '''
+    number of figures made into a figure cache, see `make_question_page`, the cache
+    also keeps the json of each figure
+    '''
+    return sum(1 for key in figure_cache if key[0] == 'figure')
+
+
+def configuration_files(config_file=None):
+    '''
+    list the configuration files to build, from file names and glob patterns
+
+    Parameters
+    ----------
+    config_file : string, list of strings or None
+        file names or patterns (eg `studies/*.yml`), if none, configuration.yml assumed
+
+    Returns
+    -------
+    config_files : list of strings
+        matching files, patterns sorted and in the order passed
+    '''
+    if not(config_file):
+        return ['configuration.yml']
+    if type(config_file) == str:
+        config_file = [config_file]
+
+    config_files = []
+    for pattern in config_file:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not(matches):
+            raise click.BadParameter('no configuration files match ' + pattern, 
+                                     param_hint='--config-file')
+        config_files += [f for f in matches if not(f in config_files)]
+    return config_files
+
+
+def build_configuration_file(config_file, out_rel_path='', archive=None, 
+                             instruction_file=None, debug=False, **build_options):
+    '''
+    build a study from its configuration file to a folder or archive and save its 
+    instructions (and query codes) next to the configuration file
+
+    Parameters
+    ----------
+    config_file : string
+        configuration file
+    out_rel_path : string
+        folder to write the pages to
+    archive : string {None}
+        .zip or .tar(.gz) file to write the pages to instead of the folder
+    instruction_file : string {None}
+        where to save the instructions, if None `<config name>-instructions.md`
+    build_options : 
+        passed to `build_study`
+
+    Returns
+    -------
+    build : dictionary
+        as from `build_study`
+    '''
     # set file names
-    if not (config_file):
-        config_file = 'configuration.yml'
-        instruction_file = 'instructions.md'
-    else:
+    if not(instruction_file):
         instruction_file = config_file[:-4] + '-instructions.md'
 
-    # --------------  load and parse the configurations
-    with open(config_file, 'r') as f:
-        loaded_config = yaml.load(f, Loader=yaml.Loader)
+    # --------------  load the configuration, build and save the instructions
+    full_config = load_configuration(config_file, debug)
 
-    # ------------------------------------------------------------------------  
-    #   process shared params if provided
-    if type(loaded_config) == list:
-         
-        # pass as is
-        full_config = loaded_config
-    elif 'shared' in loaded_config.keys():
-        full_config = expand_shared_params(loaded_config,debug)
-    
+    if archive:
+        sink = archive_sink(archive)
+    else:
+        if not(os.path.isdir(out_rel_path)):
+            os.makedirs(out_rel_path)
+        sink = output_sink(out_rel_path)
 
-    # ------------------------------------------------------------------------
-    # parse for pass through vars for sequential questions
-    
-    parsed_config = set_pass_through(full_config,study_pass_through_vars, debug)
+    build = build_study(full_config, sink, debug=debug, **build_options)
 
-    # remove metadata, inplace
-    #  could be saved, but if nested it's a dict and nontrival to print for now. 
-    [q.pop('metadata',None) for q in parsed_config]
+    if build_options.get('compact_query'):
+        write_query_codes(build['query_codes'],
+                          instruction_file[:-len('instructions.md')] + 'query-codes.json')
 
-    # -------------- generate all of the files and save the instructions
-    if not(os.path.isdir(out_rel_path)):
-        os.makedirs(out_rel_path)
-    
-    instructions = [make_question_page(**q, out_url=out_url, out_rel_path=out_rel_path,
-          debug=debug,full_html=not(fragment),instructions_type=instructions_type) 
-        for q in parsed_config]
     #  save instructions
     with open(instruction_file, 'w') as f:
-        f.write('\n'.join(instructions))
-        f.write('\n\n ## Metadata')
-        # f.write('\n'.join(metadata))
-
-    # check if end.html is required 
-    #  end.html is an option for the `next_question_url` parameter to send people to a landing
-    # page instead of qualtrics
-    next_url_list = [d['next_question_url'] for d in full_config]
-    if 'end.html' in next_url_list:
-        end_html = load_template_file('end.html')
-        with open(os.path.join(out_rel_path,'end.html'),'w') as f:
-            f.write(end_html)
-         
+        f.write(build['instructions'])
 
-    # merge if appropriate
-    if all_in_one:
-        # extract file names
-        file_list = [get_file_name(question_dict=q) for q in parsed_config]
-        page = load_template_file('page_header.html').format(study_name = repo_name)
-        for file_name in file_list:
-            with open(os.path.join(out_rel_path,file_name),'r') as f:
-                page +=f.read()
-        page += load_template_file('page_footer.html')
+    if build_options.get('manifest'):
+        build_manifest = build['manifest']
+        click.echo('{n} files: {a} added, {c} changed, {r} removed'.format(
+                        n=len(build_manifest['files']), a=len(build_manifest['added']),
+                        c=len(build_manifest['changed']), r=len(build_manifest['removed'])))
 
-        with open(os.path.join(out_rel_path, 'aio.html'),'w') as f:
-            f.write(page)
+    return build
 
 @click.command()
 @click.option('-f','--config-file')
@@ -621,10 +1926,7 @@ def question_csv(config_file=None,metadata=None,debug=False):
     '''
     '''
     # --------------  load and parse the configurations
-    with open(config_file, 'r') as f:
-        loaded_config = yaml.load(f, Loader=yaml.Loader)
-
-    full_config = expand_shared_params(loaded_config,debug)
+    full_config = load_configuration(config_file, debug)
 
     base_attrs = ['question_id','question_text']
     if metadata:
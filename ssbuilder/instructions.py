@@ -7,6 +7,9 @@ class InstructionQuestion:
         self.question_form_elements = 'form_instructions.html'
         self.logging_vars = {} if logging_vars is None else logging_vars
 
+    def logging_values(self, **kwargs):
+        return {}
+
     def generate_figure(self, **kwargs):
         return None
     
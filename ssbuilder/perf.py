@@ -0,0 +1,267 @@
+import asyncio
+import click
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from .builder import (load_configuration, question_page_path, question_variables,
+                      telemetry_var_names)
+
+# hosts the pages load from, requests to them are answered locally so that timings
+# do not depend on the network
+plotly_host = 'cdn.plot.ly'
+
+# installed before any page script runs, records when plotly first draws an svg
+first_plot_js = '''() => {
+    window.__ssFirstPlot = null;
+    new MutationObserver(function (mutations, observer) {
+        if (document.querySelector('.main-svg')) {
+            window.__ssFirstPlot = performance.now();
+            observer.disconnect();
+        }
+    }).observe(document, {childList: true, subtree: true});
+    // start time of each slider move, the move is a click on the rail
+    document.addEventListener('mousedown', function () {
+        window.__ssMoveStart = performance.now();
+    }, true);
+}'''
+
+# the slider fields of the question that are in the page form
+present_fields_js = '''(fields) => fields.filter(id => document.getElementById(id))'''
+
+# snapshot of the slider fields, a move is done when this changes. Only the question's
+#  own fields, others (eg the telemetry slider presses) change when the rail is pressed
+field_values_js = '''(fields) => JSON.stringify(fields.map(
+    id => document.getElementById(id).value))'''
+
+# polled every frame after a move until the fields update, returns the latency
+field_update_js = '''(before, fields) => {
+    const now = JSON.stringify(fields.map(id => document.getElementById(id).value));
+    return now !== before ? performance.now() - window.__ssMoveStart : false;
+}'''
+
+navigation_js = '''() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    return {load_ms: nav.loadEventEnd, dom_content_loaded_ms: nav.domContentLoadedEventEnd};
+}'''
+
+
+def study_pages(config_file):
+    '''
+    list the pages `generate_from_configuration` builds for a configuration
+
+    Parameters
+    ----------
+    config_file : string
+        configuration file the study was built from
+
+    Returns
+    -------
+    pages : list of tuples
+        question id, the page path relative to the output folder and the names of the
+        fields the question's slider writes (its logging variables)
+    '''
+    full_config = load_configuration(config_file)
+    return [(q['question_id'], question_page_path(q), 
+             [var for kind, var in question_variables(q).items() 
+              if not(kind == 'confirm' or kind in telemetry_var_names)])
+            for q in full_config]
+
+
+async def answer_local(request, plotly_js):
+    '''
+    answer requests for the plotly asset with the installed plotly.js, other remote
+    requests get an empty response, local files load as usual
+    '''
+    if request.url.startswith('file:'):
+        await request.continue_()
+    elif plotly_host in request.url:
+        await request.respond({'status': 200, 'contentType': 'application/javascript',
+                               'body': plotly_js})
+    else:
+        content_type = 'text/css' if request.resourceType == 'stylesheet' else 'text/plain'
+        await request.respond({'status': 200, 'contentType': content_type, 'body': ''})
+
+
+async def measure_page(browser, page_file, slider_fields, plotly_js, slider_moves=5, 
+                       timeout=10000):
+    '''
+    load one page and time it
+
+    Parameters
+    ----------
+    browser : pyppeteer Browser
+        open browser to make the page in
+    page_file : string
+        path to the built html file
+    slider_fields : list of strings
+        fields the slider writes, a move is timed until one of them changes
+    plotly_js : string
+        plotly.js source to serve in place of the cdn
+    slider_moves : int
+        number of programmatic moves along the slider to time
+    timeout : int
+        milliseconds to wait for the plot or a field update before giving up
+
+    Returns
+    -------
+    result : dictionary
+        load, first plot, heap and slider latency measurements, times in ms from navigation
+        start, `NaN` for what the page does not have (eg no plot on instructions)
+    '''
+    page = await browser.newPage()
+    await page.setRequestInterception(True)
+    page.on('request', lambda request: asyncio.ensure_future(answer_local(request, plotly_js)))
+    await page.evaluateOnNewDocument(first_plot_js)
+
+    url = Path(page_file).resolve().as_uri() + '?id=ssperf'
+    await page.goto(url, {'waitUntil': 'load', 'timeout': timeout})
+    result = await page.evaluate(navigation_js)
+
+    has_plot = await page.querySelector('.plotly-graph-div')
+    result['first_plot_ms'] = np.nan
+    latencies = []
+    if has_plot:
+        await page.waitForFunction('window.__ssFirstPlot !== null', {'timeout': timeout})
+        result['first_plot_ms'] = await page.evaluate('window.__ssFirstPlot')
+        # let the initial value be logged before moving
+        await page.evaluate('() => new Promise(r => requestAnimationFrame(() => r()))')
+
+        rail = await page.querySelector('.slider-rail-touch-rect')
+        box = await rail.boundingBox() if rail else None
+        # no moves are timed if the form does not have the slider's fields
+        fields = await page.evaluate(present_fields_js, slider_fields)
+        if box and fields:
+            for fraction in np.linspace(.05, .95, slider_moves):
+                before = await page.evaluate(field_values_js, fields)
+                await page.mouse.click(box['x'] + fraction * box['width'],
+                                       box['y'] + box['height'] / 2)
+                try:
+                    update = await page.waitForFunction(field_update_js,
+                                            {'polling': 'raf', 'timeout': timeout}, 
+                                            before, fields)
+                    latencies.append(await update.jsonValue())
+                except Exception:
+                    # the click landed on the step already selected
+                    latencies.append(np.nan)
+
+    metrics = await page.metrics()
+    result['js_heap_bytes'] = metrics['JSHeapUsedSize']
+    result['slider_moves'] = int(np.sum(~np.isnan(latencies))) if latencies else 0
+    result['slider_latency_median_ms'] = np.nanmedian(latencies) if result['slider_moves'] else np.nan
+    result['slider_latency_max_ms'] = np.nanmax(latencies) if result['slider_moves'] else np.nan
+    await page.close()
+    return result
+
+
+async def measure_pages(page_files, slider_fields, slider_moves=5, runs=1, timeout=10000,
+                        executable_path=None):
+    '''
+    open each page in headless chromium, `runs` times, see `measure_page`, with the 
+    fields its slider writes in `slider_fields`
+    '''
+    from pyppeteer import launch
+    from plotly.offline import get_plotlyjs
+
+    plotly_js = get_plotlyjs()
+    launch_options = {'headless': True, 'args': ['--allow-file-access-from-files']}
+    if executable_path:
+        launch_options['executablePath'] = executable_path
+    try:
+        browser = await launch(**launch_options)
+    except Exception as e:
+        # pyppeteer downloads chromium the first time, which fails without network access
+        raise click.ClickException('could not start chromium (' + repr(e) + 
+                                   '), install chromium or chrome and pass it with '
+                                   '--executable-path')
+    results = []
+    try:
+        for run in range(runs):
+            for page_file, fields in zip(page_files, slider_fields):
+                results.append(await measure_page(browser, page_file, fields, plotly_js,
+                                                  slider_moves, timeout))
+    finally:
+        await browser.close()
+    return results
+
+
+def page_performance(config_file, out_rel_path='', label='', slider_moves=5, runs=1,
+                     timeout=10000, executable_path=None):
+    '''
+    measure participant side performance of every page of a built study
+
+    Parameters
+    ----------
+    config_file : string
+        configuration file the study was built from
+    out_rel_path : string
+        folder the pages were built to
+    label : string
+        name for this build, to compare reports of different builds
+    slider_moves : int
+        number of slider moves to time per page
+    runs : int
+        number of times to load each page
+    timeout : int
+        milliseconds to wait for a page, plot or field update
+    executable_path : string
+        chromium or chrome to use, if not passed pyppeteer downloads one
+
+    Returns
+    -------
+    report : DataFrame
+        one row per page and run
+    '''
+    pages = study_pages(config_file)
+    page_files = [os.path.join(out_rel_path or '', page) for _, page, _ in pages]
+    missing = [p for p in page_files if not(os.path.isfile(p))]
+    if missing:
+        raise click.ClickException('pages not built: ' + ', '.join(missing))
+
+    # pyppeteer closes chromium from the current loop at exit, so keep one set rather than 
+    # asyncio.run, which closes it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = loop.run_until_complete(measure_pages(page_files, [f for _, _, f in pages], 
+                                                    slider_moves, runs, timeout, 
+                                                    executable_path))
+
+    report = pd.DataFrame(results)
+    report.insert(0, 'label', label)
+    report.insert(1, 'run', np.repeat(range(runs), len(pages)))
+    report.insert(2, 'question_id', [qid for qid, _, _ in pages] * runs)
+    report.insert(3, 'page', [page for _, page, _ in pages] * runs)
+    return report
+
+
+@click.command()
+@click.option('-f','--config-file', required=True, type=click.Path(exists=True),
+              help='configuration file the study was built from')
+@click.option('-p','--out-rel-path', default='',
+              help='folder the pages were built to')
+@click.option('-l','--label', default='',
+              help='name for this build, added to every row to compare builds')
+@click.option('-o','--out-name', default='page-performance.csv',
+              help='report csv, rows are added if it exists')
+@click.option('-m','--slider-moves', default=5, type=int,
+              help='number of slider moves to time on each page')
+@click.option('-n','--runs', default=1, type=int,
+              help='number of times to load each page')
+@click.option('--timeout', default=10000, type=int,
+              help='milliseconds to wait for a page, plot or field update')
+@click.option('--executable-path', default=None,
+              help='chromium to use instead of the one pyppeteer downloads')
+def cmd_page_performance(config_file, out_rel_path, label, out_name, slider_moves, runs,
+                         timeout, executable_path):
+    '''
+    open every page of a built study in headless chromium and report load time, time to
+    first plot, js heap size and slider latency (until the question's fields update)
+    '''
+    report = page_performance(config_file, out_rel_path, label, slider_moves, runs,
+                              timeout, executable_path)
+    # add to an existing report so builds can be compared
+    exists = os.path.isfile(out_name)
+    report.to_csv(out_name, mode='a' if exists else 'w', header=not(exists), index=False)
+    click.echo('wrote {r} page measurements to {out_name}'.format(r=len(report),
+                                                                   out_name=out_name))
@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import numpy as np
+from functools import lru_cache
+from html import escape
+
+# size plotly draws the figures at in the page card, with its default margins
+preview_width = 700
+preview_height = 450
+preview_margin = {'l': 80, 'r': 80, 't': 100, 'b': 80}
+# space under the plot for the slider
+slider_height = 90
+
+line_dashes = {'dash': '9,9', 'dot': '3,3', 'dashdot': '9,3,3,3',
+               'longdash': '15,6', 'longdashdot': '15,6,3,6'}
+
+
+@lru_cache()
+def plotly_script_attributes():
+    '''
+    the cdn url and subresource integrity hash of the installed plotly.js, the same that
+    `to_html(include_plotlyjs='cdn')` writes
+
+    Returns
+    -------
+    src, integrity : strings
+    '''
+    from plotly.offline import get_plotlyjs
+    from plotly.io._utils import plotly_cdn_url
+
+    digest = hashlib.sha256(get_plotlyjs().encode('utf-8')).digest()
+    return plotly_cdn_url(), 'sha256-' + base64.b64encode(digest).decode('utf-8')
+
+
+def axis_range(layout_axis, values, zero=False):
+    '''
+    range of an axis, fixed in the layout or from the data
+    '''
+    if layout_axis is not None and layout_axis.range is not None:
+        return [float(v) for v in layout_axis.range]
+    values = np.concatenate([np.asarray(v, dtype=float) for v in values]) if values else np.array([0, 1])
+    low, high = np.nanmin(values), np.nanmax(values)
+    if zero:
+        low = min(low, 0)
+    if high == low:
+        high = low + 1
+    return [low, high]
+
+
+def trace_color(trace, i, colorway):
+    '''
+    color set on a line or bar trace or the template color for its position
+    '''
+    for part in ['line', 'marker']:
+        color = getattr(getattr(trace, part, None), 'color', None)
+        if type(color) == str:
+            return color
+    return colorway[i % len(colorway)]
+
+
+def figure_preview_svg(fig, width=preview_width, height=preview_height):
+    '''
+    draw the visible traces of a figure (lines and bars) and its slider as a plain svg,
+    to show in the page while plotly.js loads
+
+    Parameters
+    ----------
+    fig : plotly figure object
+        figure as made by a question type's `generate_figure`
+    width, height : int
+        size of the svg, in plotly's default pixels
+
+    Returns
+    -------
+    svg : string
+        svg element that scales to the width of the page card
+    '''
+    visible = [t for t in fig.data if not(t.visible in [False, 'legendonly'])]
+    colorway = list(fig.layout.template.layout.colorway or ['#636efa'])
+
+    has_slider = bool(fig.layout.sliders)
+    plot_left = preview_margin['l']
+    plot_right = width - preview_margin['r']
+    plot_top = preview_margin['t']
+    plot_bottom = height - preview_margin['b'] - (slider_height if has_slider else 0)
+
+    bars = [t for t in visible if t.type == 'bar']
+    lines = [t for t in visible if t.type == 'scatter']
+    shapes = []
+
+    if bars:
+        # grouped bars over categories, in the order they first appear
+        categories = list(dict.fromkeys(x for t in bars for x in t.x))
+        y_low, y_high = axis_range(fig.layout.yaxis, [t.y for t in bars], zero=True)
+        y_scale = lambda y: plot_bottom - (y - y_low) / (y_high - y_low) * (plot_bottom - plot_top)
+        slot = (plot_right - plot_left) / len(categories)
+        bar_width = slot * .8 / len(bars)
+        for i, t in enumerate(bars):
+            color = escape(trace_color(t, i, colorway))
+            for x, y in zip(t.x, t.y):
+                left = plot_left + categories.index(x) * slot + slot * .1 + i * bar_width
+                top = y_scale(max(min(y, y_high), y_low))
+                base = y_scale(max(y_low, 0))
+                shapes.append(f'<rect x="{left:.1f}" y="{min(top, base):.1f}" '
+                              f'width="{bar_width:.1f}" height="{abs(base - top):.1f}" fill="{color}"/>')
+        for j, category in enumerate(categories):
+            shapes.append(f'<text x="{plot_left + (j + .5) * slot:.1f}" y="{plot_bottom + 20}" '
+                          f'text-anchor="middle" font-size="12" fill="#444">'
+                          f'{escape(str(category))}</text>')
+
+    if lines:
+        x_low, x_high = axis_range(fig.layout.xaxis, [t.x for t in lines])
+        x_scale = lambda x: plot_left + (x - x_low) / (x_high - x_low) * (plot_right - plot_left)
+        # each y axis is scaled on its own, like plotly does
+        y_ranges = {}
+        for axis in set((t.yaxis or 'y') for t in lines):
+            layout_axis = fig.layout['yaxis' + axis[1:]]
+            y_ranges[axis] = axis_range(layout_axis, [t.y for t in lines if (t.yaxis or 'y') == axis])
+        for i, t in enumerate(lines):
+            y_low, y_high = y_ranges[t.yaxis or 'y']
+            x = np.clip(np.asarray(t.x, dtype=float), x_low, x_high)
+            y = np.clip(np.asarray(t.y, dtype=float), y_low, y_high)
+            y = plot_bottom - (y - y_low) / (y_high - y_low) * (plot_bottom - plot_top)
+            points = ' '.join(f'{px_:.1f},{py_:.1f}' for px_, py_ in zip(x_scale(x), y))
+            width_px = t.line.width or 2
+            dash = line_dashes.get(t.line.dash, None)
+            dash_attr = f' stroke-dasharray="{dash}"' if dash else ''
+            shapes.append(f'<polyline points="{points}" fill="none" '
+                          f'stroke="{escape(trace_color(t, i, colorway))}" '
+                          f'stroke-width="{width_px}"{dash_attr}/>')
+
+    # axis lines
+    shapes.append(f'<path d="M{plot_left},{plot_top}V{plot_bottom}H{plot_right}" '
+                  f'fill="none" stroke="#ccc"/>')
+
+    if has_slider:
+        slider = fig.layout.sliders[0]
+        steps = len(slider.steps) if slider.steps else 1
+        active = min(slider.active or 0, steps - 1)
+        rail_y = height - slider_height + 20
+        handle_x = plot_left + active / max(steps - 1, 1) * (plot_right - plot_left)
+        shapes.append(f'<rect x="{plot_left}" y="{rail_y - 2}" width="{plot_right - plot_left}" '
+                      f'height="5" rx="2" fill="#f8fafc" stroke="#bec8d9"/>')
+        shapes.append(f'<rect x="{handle_x - 10:.1f}" y="{rail_y - 10}" width="20" height="20" '
+                      f'rx="3" fill="#f6f6f6" stroke="#bec8d9"/>')
+
+    return (f'<svg class="ss-preview" viewBox="0 0 {width} {height}" width="100%" '
+            f'height="{height}" role="img" aria-label="figure loading">' +
+            ''.join(shapes) + '</svg>')
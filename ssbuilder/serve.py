@@ -0,0 +1,305 @@
+import click
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from .builder import (load_configuration, set_pass_through, assign_query_codes,
+                      make_question_page, question_page_path, load_template_file)
+from .sinks import MemorySink
+
+
+class LRUCache():
+    '''
+    dictionary that keeps the most recently used values, up to `max_size` in total,
+    each value counts `sizeof(value)` (eg `len` for bytes) or 1 if not passed. Safe to
+    use from several threads
+    '''
+    def __init__(self, max_size=128, sizeof=None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.size = 0
+        self.values = OrderedDict()
+        self.lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.values
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = self.values[key]
+            self.values.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            if key in self.values:
+                self.size -= self.sizeof(self.values.pop(key))
+            self.values[key] = value
+            self.size += self.sizeof(value)
+            # drop the least recently used, the newest is kept even if it is too big
+            while self.size > self.max_size and len(self.values) > 1:
+                _, old_value = self.values.popitem(last=False)
+                self.size -= self.sizeof(old_value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.size = 0
+
+
+class StudyPages():
+    '''
+    render the pages of a study from its configuration when they are first asked for,
+    instead of building them all. Rendered pages (and shared figure files) are kept in
+    an LRU cache, and the configuration is loaded again when it, or a data file it
+    uses, changes
+
+    Parameters
+    ----------
+    config_file : string
+        configuration file of the study
+    study_pass_through_vars : list
+        variables that all questions pass through
+    cache_bytes : int
+        most bytes of rendered files to keep
+    figure_cache_size : int
+        most figures to keep, figures are kept when only the configuration changes
+    debug : bool
+        print debugging information or not
+    page_options :
+        other options of `make_question_page`, eg `static_preview`, and `compact_query`
+    '''
+    def __init__(self, config_file, study_pass_through_vars=['id'], cache_bytes=64*2**20,
+                 figure_cache_size=128, debug=False, **page_options):
+        self.config_file = config_file
+        self.study_pass_through_vars = list(study_pass_through_vars)
+        self.compact_query = page_options.pop('compact_query', False)
+        self.page_options = page_options
+        self.debug = debug
+        self.files = LRUCache(cache_bytes, len)
+        self.figure_cache = LRUCache(figure_cache_size)
+        # one render at a time, rendering is mostly python so threads would not help
+        self.render_lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.watched = {}
+        self.error = None
+        self.questions = {}
+        self.first_page = None
+        self.end_page = False
+        self.asset_pages = {}
+        self.query_codes = None
+        self.load()
+
+    def watched_files(self):
+        '''
+        modification time of the configuration file and of the data files its figures
+        are made from, `None` for files that are not there
+        '''
+        data_files = [str(value) for q in self.questions.values()
+                      for param, value in (q.get('figure_values') or {}).items()
+                      if param.endswith('_file')]
+        mtimes = {}
+        for file_path in [self.config_file] + data_files:
+            mtimes[file_path] = (os.stat(file_path).st_mtime_ns
+                                 if os.path.isfile(file_path) else None)
+        return mtimes
+
+    def load(self):
+        '''
+        load the configuration and resolve where each question forwards to, rendered
+        files are dropped, and figures too if a data file changed
+        '''
+        try:
+            full_config = load_configuration(self.config_file, self.debug)
+            parsed_config = set_pass_through(full_config, self.study_pass_through_vars,
+                                             self.debug)
+            self.query_codes = (assign_query_codes(parsed_config, self.study_pass_through_vars)
+                                if self.compact_query else None)
+            [q.pop('metadata', None) for q in parsed_config]
+        except Exception as e:
+            # keep serving the error until the configuration is fixed
+            self.error = 'could not load ' + self.config_file + ': ' + repr(e)
+            self.watched = self.watched_files()
+            click.echo(self.error, err=True)
+            return
+
+        old_watched = self.watched
+        self.error = None
+        self.questions = {question_page_path(q): q for q in parsed_config}
+        self.first_page = question_page_path(parsed_config[0]) if parsed_config else None
+        self.end_page = any(q['next_question_url'] == 'end.html' for q in parsed_config)
+        # shared figure files come from the page that uses them
+        self.asset_pages = {}
+        self.watched = self.watched_files()
+        self.files.clear()
+        data_changed = any(old_watched.get(f, m) != m for f, m in self.watched.items()
+                           if not(f == self.config_file))
+        if data_changed:
+            self.figure_cache.clear()
+        if self.debug:
+            click.echo('loaded ' + str(len(self.questions)) + ' pages from ' + self.config_file)
+
+    def reload_if_changed(self):
+        '''
+        load the configuration again if a watched file changed, see `watched_files`
+        '''
+        with self.reload_lock:
+            if not(self.watched == self.watched_files()):
+                click.echo('reloading ' + self.config_file)
+                with self.render_lock:
+                    self.load()
+
+    def render(self, file_path):
+        '''
+        render the page a file is made by and keep every file it writes
+
+        Returns
+        -------
+        content : bytes
+            contents of the file, or None if no page in the study makes it
+        '''
+        with self.render_lock:
+            # rendered while waiting for the lock
+            content = self.files.get(file_path)
+            if content is not None:
+                return content
+
+            sink = MemorySink()
+            page_path = self.asset_pages.get(file_path, file_path)
+            if page_path in self.questions:
+                make_question_page(**self.questions[page_path], out_url='', out_rel_path=sink,
+                                   debug=self.debug, query_codes=self.query_codes,
+                                   written={}, figure_cache=self.figure_cache,
+                                   **self.page_options)
+            elif page_path == 'end.html' and self.end_page:
+                sink.write('end.html', load_template_file('end.html').encode('utf-8'))
+            else:
+                return None
+
+            for written_path, content in sink.files.items():
+                self.files[written_path] = content
+                if not(written_path == page_path):
+                    self.asset_pages[written_path] = page_path
+            return sink.files.get(file_path)
+
+    def get(self, file_path):
+        '''
+        contents of a file of the study, rendered if it is not cached, None if there is
+        no such file
+        '''
+        self.reload_if_changed()
+        content = self.files.get(file_path)
+        if content is None:
+            content = self.render(file_path)
+        return content
+
+
+class StudyRequestHandler(BaseHTTPRequestHandler):
+    '''
+    answer GET requests with the pages of `server.study`, a `StudyPages`
+    '''
+    def do_GET(self):
+        study = self.server.study
+        path = unquote(urlsplit(self.path).path).lstrip('/')
+        if path == '' and not('index.html' in study.questions) and study.first_page:
+            # start at the first question, with the query string (eg the id)
+            query = urlsplit(self.path).query
+            self.send_response(302)
+            self.send_header('Location', '/' + study.first_page + ('?' + query if query else ''))
+            self.end_headers()
+            return
+        if path == '' or path.endswith('/'):
+            path += 'index.html'
+
+        start = time.perf_counter()
+        error = None
+        try:
+            content = study.get(path)
+        except Exception as e:
+            error = 'could not render ' + path + ': ' + repr(e)
+            click.echo(error, err=True)
+        error = error or study.error
+        if error:
+            self.send_text(500, error)
+            return
+        if content is None:
+            self.send_text(404, path + ' is not a page of ' + study.config_file)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(content)
+        if study.debug:
+            click.echo('{path} in {ms:.1f} ms'.format(path=path,
+                                                      ms=(time.perf_counter() - start) * 1000))
+
+    def send_text(self, status, text):
+        content = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve_study(config_file, host='127.0.0.1', port=8000, **study_options):
+    '''
+    serve the pages of a study on a local http server, rendering each when it is first
+    asked for, see `StudyPages` for the options. Runs until interrupted
+    '''
+    server = ThreadingHTTPServer((host, port), StudyRequestHandler)
+    server.study = StudyPages(config_file, **study_options)
+    click.echo('serving {config_file} at http://{host}:{port}/'.format(
+        config_file=config_file, host=host, port=server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@click.command()
+@click.option('-f','--config-file', required=True, type=click.Path(exists=True),
+              help='configuration file of the study')
+@click.option('--host', default='127.0.0.1', help='address to serve on')
+@click.option('--port', default=8000, type=int, help='port to serve on')
+@click.option('-v','--study-pass-through-vars', multiple=True, default=['id'])
+@click.option('-c','--compact-query', is_flag=True,
+              help='pack variables passed between pages into one short parameter')
+@click.option('-s','--static-preview', is_flag=True,
+              help='show a static image of each figure first and load plotly after the page')
+@click.option('-j','--figure-assets', is_flag=True,
+              help='serve each distinct figure as a shared json file the pages load')
+@click.option('--cache-mb', default=64., type=float,
+              help='most megabytes of rendered pages to keep')
+@click.option('--figure-cache', default=128, type=int,
+              help='most figures to keep')
+@click.option('-d','--debug', is_flag=True)
+def cmd_serve_study(config_file, host, port, study_pass_through_vars, compact_query,
+                    static_preview, figure_assets, cache_mb, figure_cache, debug):
+    '''
+    serve a study for previews without building it, each page is made when it is first
+    opened and the configuration is reloaded when it changes
+    '''
+    serve_study(config_file, host, port, study_pass_through_vars=study_pass_through_vars,
+                cache_bytes=int(cache_mb * 2**20), figure_cache_size=figure_cache,
+                debug=debug, compact_query=compact_query, static_preview=static_preview,
+                figure_assets=figure_assets)
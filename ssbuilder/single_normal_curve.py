@@ -9,11 +9,89 @@ from scipy.stats import norm
 
 
 class NormalCurveSlider():
-    def __init__(self,logging_vars={'location_var_name': 'loc',
-                               'overlap_var_name': 'ov'}):
+    def __init__(self,logging_vars=None):
         self.plot_logging_js = 'plot_log_normal_curve.js'
         self.question_form_elements = 'form_normal_curve.html'
-        self.logging_vars =logging_vars
+        # a copy, so the default and the caller's dictionary are never changed
+        self.logging_vars = ({'location_var_name': 'loc', 'overlap_var_name': 'ov'} 
+                             if logging_vars is None else dict(logging_vars))
+
+    def slider_values(self, static_mean=80, static_curve_width=10, dynamic_curve_width=10,
+                      num_slider_locs=101, min_slider_value=None, max_slider_value=None,
+                      overlap_decimals=2, mean_decimals=None):
+        '''
+        compute the curves and the values logged at each slider location, parameters
+        are the same as for `generate_figure`
+
+        Returns
+        -------
+        slider : dictionary
+            `shared_x`, `fixed_curve`, `dynamic_curves`, and for each slider location 
+            `overlap` and `locations` (the logged values) and the `mean_decimals` used
+        '''
+        # fill in min/max if needed
+        # None evaluates to False
+        if not(min_slider_value) :
+            min_slider_value = 0
+        
+        if not(max_slider_value):
+            max_slider_value = num_slider_locs
+        # compute the slider step size
+        slider_step = (max_slider_value-min_slider_value)/num_slider_locs
+        
+        # update mean decimals base on step size  if not passed
+        if not(mean_decimals):
+            # if the step size is an integer, round the mean to integers, otherwise 2 places 
+            if slider_step.is_integer():
+                mean_decimals = 0
+            else:   
+                mean_decimals = 2
+
+        # set x value
+        shared_x = np.arange(min_slider_value, max_slider_value, slider_step)
+
+        # convert the means to indices 
+
+
+        # convenience function for nomal curve
+        curve_func = lambda mu,cw: norm.pdf(shared_x,loc=mu,scale=cw)
+        # compute the curves, first fixted then a list of the dynamic
+        fixed_curve = curve_func(static_mean,static_curve_width)
+        dynamic_curves = [curve_func(mu,dynamic_curve_width) for mu in shared_x]
+        # comput overlap by ~ integrating the minimum value over the window size for each dynamic with the static
+        overlap_raw = [np.sum(np.min([fixed_curve,cur_curve],axis=0)) for cur_curve in dynamic_curves]
+        # compute to a % of the area under the fixed curve and scale 
+        overlap = [np.round(ov/sum(fixed_curve)*100,overlap_decimals) for ov in overlap_raw]
+        # the location logged is the index of the peak
+        locations = [np.round(np.argmax(curve),mean_decimals) for curve in dynamic_curves]
+
+        return {'shared_x': shared_x, 'fixed_curve': fixed_curve, 
+                'dynamic_curves': dynamic_curves, 'overlap': overlap,
+                'locations': locations, 'mean_decimals': mean_decimals}
+
+    def logging_values(self, static_mean=80, static_curve_width=10, dynamic_curve_width=10,
+                       num_slider_locs=101, min_slider_value=None, max_slider_value=None,
+                       overlap_decimals=2, mean_decimals=None, **kwargs):
+        '''
+        all of the values the page can send for each logging variable, as text, including 
+        the defaults in the form. Parameters are the same as for `generate_figure`, any 
+        that do not change the values are ignored
+
+        Returns
+        -------
+        values : dictionary
+            logging variable keys and a list of possible values
+        '''
+        slider = self.slider_values(static_mean=static_mean, static_curve_width=static_curve_width,
+                                    dynamic_curve_width=dynamic_curve_width,
+                                    num_slider_locs=num_slider_locs, 
+                                    min_slider_value=min_slider_value,
+                                    max_slider_value=max_slider_value,
+                                    overlap_decimals=overlap_decimals, 
+                                    mean_decimals=mean_decimals)
+        # defaults are from form_normal_curve.html
+        return {'location_var_name': ['-1'] + [str(loc) for loc in slider['locations']],
+                'overlap_var_name': ['default'] + [str(ov) for ov in slider['overlap']]}
 
     def generate_figure(self,static_name='other group', static_color="#CE00D1", 
                             static_mean=80,static_curve_width=10,
@@ -67,39 +145,18 @@ class NormalCurveSlider():
         ------
         curve is drawn with scipy.norm 
         '''
-        # fill in min/max if needed
-        # None evaluates to False
-        if not(min_slider_value) :
-            min_slider_value = 0
-        
-        if not(max_slider_value):
-            max_slider_value = num_slider_locs
-        # compute the slider step size
-        slider_step = (max_slider_value-min_slider_value)/num_slider_locs
-        
-        # update mean decimals base on step size  if not passed
-        if not(mean_decimals):
-            # if the step size is an integer, round the mean to integers, otherwise 2 places 
-            if slider_step.is_integer():
-                mean_decimals = 0
-            else:   
-                mean_decimals = 2
-
-        # set x value
-        shared_x = np.arange(min_slider_value, max_slider_value, slider_step)
-
-        # convert the means to indices 
-
-
-        # convenience function for nomal curve
-        curve_func = lambda mu,cw: norm.pdf(shared_x,loc=mu,scale=cw)
-        # compute the curves, first fixted then a list of the dynamic
-        fixed_curve = curve_func(static_mean,static_curve_width)
-        dynamic_curves = [curve_func(mu,dynamic_curve_width) for mu in shared_x]
-        # comput overlap by ~ integrating the minimum value over the window size for each dynamic with the static
-        overlap_raw = [np.sum(np.min([fixed_curve,cur_curve],axis=0)) for cur_curve in dynamic_curves]
-        # compute to a % of the area under the fixed curve and scale 
-        overlap = [np.round(ov/sum(fixed_curve)*100,overlap_decimals) for ov in overlap_raw]
+        slider = self.slider_values(static_mean=static_mean, static_curve_width=static_curve_width,
+                                    dynamic_curve_width=dynamic_curve_width,
+                                    num_slider_locs=num_slider_locs, 
+                                    min_slider_value=min_slider_value,
+                                    max_slider_value=max_slider_value,
+                                    overlap_decimals=overlap_decimals, 
+                                    mean_decimals=mean_decimals)
+        shared_x = slider['shared_x']
+        fixed_curve = slider['fixed_curve']
+        dynamic_curves = slider['dynamic_curves']
+        overlap = slider['overlap']
+        mean_decimals = slider['mean_decimals']
 
         # Create figure
 
@@ -118,8 +175,7 @@ class NormalCurveSlider():
         # norm.cdf(b, loc=mean, scale=sd)
 
         # Add traces, one for each slider step
-        for curve,ov in zip(dynamic_curves,overlap):
-            mean = np.round(np.argmax(curve),mean_decimals)
+        for curve,ov,mean in zip(dynamic_curves,overlap,slider['locations']):
             fig.add_trace(
                 go.Scatter(
                     visible=False,
@@ -156,6 +212,11 @@ class NormalCurveSlider():
             sliders=sliders,
             xaxis_title=xaxis_title
         )
+        # values to log for each slider step, so the page js can look them up by index
+        #  initial is the step of the trace visible when the page loads
+        fig.update_layout(meta={'location': [str(loc) for loc in slider['locations']],
+                                'overlap': [str(ov) for ov in overlap],
+                                'initial': dynamic_starting_mean - 1})
 
         fig.update_xaxes(fixedrange=True)
         fig.update_yaxes(fixedrange=True)
@@ -0,0 +1,216 @@
+import io
+import os
+import tarfile
+import time
+import zipfile
+
+
+class DirectorySink():
+    '''
+    write built files to a folder, files whose contents have not changed are not
+    rewritten
+    '''
+    def __init__(self, out_rel_path=None):
+        self.out_rel_path = out_rel_path or ''
+
+    def read(self, file_path):
+        '''
+        contents of a file in the output, as bytes, or None if it is not there
+        '''
+        out_path = os.path.join(self.out_rel_path, file_path)
+        if not(os.path.isfile(out_path)):
+            return None
+        with open(out_path, 'rb') as f:
+            return f.read()
+
+    def write(self, file_path, content):
+        '''
+        write a file, if it is new or different
+
+        Parameters
+        ----------
+        file_path : string
+            path of the file in the output
+        content : bytes
+            contents of the file
+
+        Returns
+        -------
+        status : string {'added', 'changed', 'unchanged'}
+        '''
+        old_content = self.read(file_path)
+        if old_content == content:
+            return 'unchanged'
+
+        out_path = os.path.join(self.out_rel_path, file_path)
+        if os.path.dirname(out_path):
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, 'wb') as f:
+            f.write(content)
+        return 'added' if old_content is None else 'changed'
+
+    def close(self):
+        pass
+
+
+class MemorySink():
+    '''
+    keep built files in `files`, a dictionary of path to bytes, nothing is written to
+    disk. Pass the files of an earlier build to see what changed
+    '''
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+
+    def read(self, file_path):
+        return self.files.get(file_path.replace(os.sep, '/'))
+
+    def write(self, file_path, content):
+        '''
+        keep a file, see `DirectorySink.write`
+        '''
+        file_path = file_path.replace(os.sep, '/')
+        old_content = self.files.get(file_path)
+        self.files[file_path] = content
+        if old_content is None:
+            return 'added'
+        return 'unchanged' if old_content == content else 'changed'
+
+    def close(self):
+        pass
+
+
+class CallbackSink(MemorySink):
+    '''
+    pass each built file to `callback(file_path, content)` as it is written, eg to
+    upload it, and keep it in `files`
+    '''
+    def __init__(self, callback, files=None):
+        super().__init__(files)
+        self.callback = callback
+
+    def write(self, file_path, content):
+        status = super().write(file_path, content)
+        # files written again by other pages (eg shared figures) are passed once
+        if not(status == 'unchanged'):
+            self.callback(file_path.replace(os.sep, '/'), content)
+        return status
+
+
+class ArchiveSink(MemorySink):
+    '''
+    keep the built files in memory and write them to one archive when the build is 
+    done. The files of an archive already at `archive_path` are read first, so what 
+    is added or changed (eg in the manifest) is since that archive, but only the files
+    this build writes are in the new one. An archive that cannot be read is replaced
+    '''
+    archive_errors = ()
+
+    def __init__(self, archive_path):
+        super().__init__()
+        self.archive_path = archive_path
+        self.previous = {}
+        if os.path.isfile(archive_path):
+            try:
+                self.previous = self.read_archive()
+            except self.archive_errors:
+                pass
+
+    def read_archive(self):
+        '''
+        contents of the archive at `archive_path`, a dictionary of path to bytes
+        '''
+        raise NotImplementedError
+
+    def read(self, file_path):
+        content = super().read(file_path)
+        if content is None:
+            content = self.previous.get(file_path.replace(os.sep, '/'))
+        return content
+
+    def write(self, file_path, content):
+        '''
+        keep a file, see `DirectorySink.write`
+        '''
+        old_content = self.read(file_path)
+        self.files[file_path.replace(os.sep, '/')] = content
+        if old_content is None:
+            return 'added'
+        return 'unchanged' if old_content == content else 'changed'
+
+
+class ZipSink(ArchiveSink):
+    '''
+    write all of the built files to one zip archive when the build is done, see
+    `ArchiveSink`
+    '''
+    archive_errors = (zipfile.BadZipFile, OSError)
+
+    def __init__(self, archive_path, compression=zipfile.ZIP_DEFLATED):
+        super().__init__(archive_path)
+        self.compression = compression
+
+    def read_archive(self):
+        with zipfile.ZipFile(self.archive_path) as archive:
+            return {name: archive.read(name) for name in archive.namelist() 
+                    if not(name.endswith('/'))}
+
+    def close(self):
+        with zipfile.ZipFile(self.archive_path, 'w', self.compression) as archive:
+            for file_path in sorted(self.files):
+                archive.writestr(file_path, self.files[file_path])
+
+
+class TarSink(ArchiveSink):
+    '''
+    write all of the built files to one tar archive when the build is done, compressed
+    if `mode` is eg `'w:gz'`, see `ArchiveSink`
+    '''
+    archive_errors = (tarfile.TarError, OSError, EOFError)
+
+    def __init__(self, archive_path, mode='w'):
+        super().__init__(archive_path)
+        self.mode = mode
+
+    def read_archive(self):
+        with tarfile.open(self.archive_path, 'r:*') as archive:
+            return {member.name: archive.extractfile(member).read() 
+                    for member in archive.getmembers() if member.isfile()}
+
+    def close(self):
+        now = time.time()
+        with tarfile.open(self.archive_path, self.mode) as archive:
+            for file_path in sorted(self.files):
+                info = tarfile.TarInfo(file_path)
+                info.size = len(self.files[file_path])
+                info.mtime = now
+                archive.addfile(info, io.BytesIO(self.files[file_path]))
+
+
+def output_sink(out_rel_path=None):
+    '''
+    the sink to write to for an output, a folder path is written to with a
+    `DirectorySink`, sinks are used as they are
+
+    Parameters
+    ----------
+    out_rel_path : string or sink
+        folder or one of the sinks in this module, or any object with `read`, `write`
+        and `close` methods like them
+    '''
+    if out_rel_path is None or isinstance(out_rel_path, (str, os.PathLike)):
+        return DirectorySink(out_rel_path)
+    return out_rel_path
+
+
+def archive_sink(archive_path):
+    '''
+    a `ZipSink` or `TarSink` for an archive file name, by its extension
+    '''
+    tar_modes = {'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz', '.tar.bz2': 'w:bz2',
+                 '.tar.xz': 'w:xz'}
+    for extension, mode in tar_modes.items():
+        if archive_path.endswith(extension):
+            return TarSink(archive_path, mode)
+    if archive_path.endswith('.zip'):
+        return ZipSink(archive_path)
+    raise ValueError('archives can be .zip or ' + ', '.join(tar_modes) + ', not ' + archive_path)
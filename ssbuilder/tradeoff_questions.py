@@ -5,13 +5,36 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 from scipy.stats import norm
+from functools import lru_cache
 
 
 class TradeoffBar():
-    def __init__(self, logging_vars={'location_var_name': 'model_number', }):
+    def __init__(self, logging_vars=None):
         self.plot_logging_js = 'plot_log_tradeoff_bar.js'
         self.question_form_elements = 'form_tradeoff.html'
-        self.logging_vars = logging_vars
+        self.logging_vars = ({'location_var_name': 'model_number'} 
+                             if logging_vars is None else dict(logging_vars))
+
+    def logging_values(self, pretty_data_file, slider_column='model_number', x_col='metric',
+                       x_value1='accuracy', x_value2='false_positive_rate', **kwargs):
+        '''
+        all of the values the page can send for each logging variable, as text, including 
+        the default in the form. Parameters are the same as for `generate_figure`, any 
+        that do not change the values are ignored
+
+        Returns
+        -------
+        values : dictionary
+            logging variable keys and a list of possible values
+        '''
+        df = read_data_file(pretty_data_file)
+        masked_df = df[(df[x_col] == x_value1) | (df[x_col] == x_value2)]
+        # the slider location goes through the figure json, so whole numbers are written 
+        # by js without a decimal
+        as_js = lambda v: str(int(v)) if float(v).is_integer() else str(v)
+        # default is from form_tradeoff.html
+        return {'location_var_name': ['default'] + 
+                [as_js(v) for v in masked_df[slider_column].unique()]}
 
     def generate_figure(self,pretty_data_file, slider_column='model_number', slider_label='Model',
                         x_col='metric', x_value1='accuracy', x_value1_hover='accurate',
@@ -56,7 +79,7 @@ class TradeoffBar():
         figure object based on parameters
 
         '''
-        df = pd.read_csv(pretty_data_file)
+        df = read_data_file(pretty_data_file)
 
         mask1 = df[x_col] == x_value1
         mask2 = df[x_col] == x_value2
@@ -98,17 +121,132 @@ class TradeoffBar():
         # set slider and replot data
         fig._layout_obj.sliders[0].active = default_selection
         fig = go.Figure(data =fig['frames'][default_selection]['data'], frames=fig['frames'], layout=fig.layout)
+        # values to log for each slider step (one per frame), so the page js can look them up
+        fig.update_layout(meta={'location': [frame.data[0].meta['slider_loc'] for frame in fig.frames],
+                                'initial': default_selection})
         
         return fig
 
 
+@lru_cache(maxsize=32)
+def cached_data_file(file_path, mtime, size):
+    '''
+    read a data file once per version of it, see `read_data_file`
+    '''
+    return pd.read_csv(file_path)
+
+
+def read_data_file(pretty_data_file):
+    '''
+    read a figure's data file, a file already read by this process is reused (eg by 
+    every question and study that uses it) until it changes on disk
+
+    Parameters
+    ----------
+    pretty_data_file : string
+        path to the csv
+
+    Returns
+    -------
+    df : DataFrame
+        a copy of the data, so it can be changed
+    '''
+    stat = os.stat(pretty_data_file)
+    return cached_data_file(os.path.abspath(pretty_data_file), stat.st_mtime_ns, 
+                            stat.st_size).copy()
+
+
+def hover_tables(masked_df, x_col, trace_col, color_col, y_col, color_hover, num_digits):
+    '''
+    text tables of the values at every model, for the vertical line hover text. Each is 
+    the same as pivoting the model's rows to one row per trace and one column per group 
+    and printing it with `DataFrame.to_string(index=False)` with values rounded to 
+    `num_digits`, but all models are formatted at once
+
+    Returns
+    -------
+    tables : Series
+        indexed by the values of `x_col`, each table with `<br>` between lines
+    '''
+    pivot = masked_df.pivot(index=[x_col, trace_col], columns=color_col, values=y_col)
+    models = pivot.index.get_level_values(0)
+    # a model's table only has columns for the groups in its rows
+    present = (masked_df.groupby([x_col, color_col]).size().unstack(fill_value=0)
+                       .reindex(columns=pivot.columns, fill_value=0) > 0)
+
+    def as_text(values, integer):
+        # floats rounded as `str(np.round(f, num_digits))`, whole numbers as is where 
+        #  `integer` is True
+        text = pd.Series(np.round(values.to_numpy(dtype=float), num_digits).astype(str),
+                         index=values.index, dtype=object).where(values.notna(), 'NaN')
+        integer = pd.Series(integer, index=values.index, dtype=bool)
+        if integer.any():
+            text = text.where(~integer, values.fillna(0).astype('int64').astype(str).astype(object))
+        return text
+
+    # header and cell text for each column, the trace names first. to_string puts a 
+    #  space before the header of numeric columns
+    trace_values = pd.Series(pivot.index.get_level_values(1), index=pivot.index)
+    if pd.api.types.is_numeric_dtype(trace_values):
+        headers = [' ' + trace_col]
+        cells = [as_text(trace_values, pd.api.types.is_integer_dtype(trace_values))]
+    else:
+        headers = [trace_col]
+        cells = [trace_values.astype(str).astype(object)]
+    # whole number values stay whole unless the model's table has an empty cell, which 
+    #  makes all of its columns float
+    int_values = False
+    if pd.api.types.is_integer_dtype(masked_df[y_col]):
+        empty_cell = (pivot.isna() & present.reindex(models).to_numpy()).any(axis=1)
+        int_values = ~empty_cell.groupby(level=0).transform('any')
+    for g in pivot.columns:
+        headers.append(' ' + ' '.join([g, color_hover]))
+        cells.append(as_text(pivot[g], int_values))
+
+    rows = pd.Series('', index=pivot.index, dtype=object)
+    header_row = pd.Series('', index=present.index, dtype=object)
+    for i, (header, text) in enumerate(zip(headers, cells)):
+        # columns are right justified to the widest value in the model or the header
+        lengths = text.str.len()
+        model_width = lengths.groupby(level=0).max().clip(lower=len(header))
+        width = pd.Series(model_width.reindex(models).to_numpy(), index=pivot.index)
+        cell = pd.Series(' ', index=pivot.index, dtype=object) * (width - lengths) + text
+        head = pd.Series(' ', index=model_width.index, dtype=object) * (model_width - len(header)) + header
+        if i > 0:
+            in_model = present[pivot.columns[i - 1]]
+            cell = (' ' + cell).where(pd.Series(in_model.reindex(models).to_numpy(), index=pivot.index), '')
+            head = (' ' + head).where(in_model.reindex(head.index), '')
+        rows += cell
+        header_row += head.reindex(header_row.index)
+
+    return header_row + '<br>' + rows.groupby(level=0).agg('<br>'.join)
+
+
 class TradeoffLine():
 
-    def __init__(self, logging_vars={'location_var_name': 'model_number', }):
+    def __init__(self, logging_vars=None):
         self.plot_logging_js = 'plot_log_tradeoff_line.js'
         self.question_form_elements = 'form_tradeoff.html'
-        self.logging_vars = logging_vars
+        self.logging_vars = ({'location_var_name': 'model_number'} 
+                             if logging_vars is None else dict(logging_vars))
+
+    def logging_values(self, pretty_data_file, trace_col='metric', x_col='model_number',
+                       trace_value1='accuracy', trace_value2='false_positive_rate', **kwargs):
+        '''
+        all of the values the page can send for each logging variable, as text, including 
+        the default in the form. Parameters are the same as for `generate_figure`, any 
+        that do not change the values are ignored
 
+        Returns
+        -------
+        values : dictionary
+            logging variable keys and a list of possible values
+        '''
+        df = read_data_file(pretty_data_file)
+        masked_df = df[(df[trace_col] == trace_value1) | (df[trace_col] == trace_value2)]
+        # default is from form_tradeoff.html, others are the vertical line locations 
+        return {'location_var_name': ['default'] + 
+                [str(v) for v in masked_df[x_col].unique()]}
 
     def generate_figure(self,pretty_data_file, slider_label='Model', trace_col='metric',
                         x_col='model_number', trace_value1='accuracy', trace1_hover='accurate',
@@ -156,7 +294,7 @@ class TradeoffLine():
             figure object based on parameters
 
             '''
-            df = pd.read_csv(pretty_data_file)
+            df = read_data_file(pretty_data_file)
 
             mask1 = df[trace_col] == trace_value1
             mask2 = df[trace_col] == trace_value2
@@ -190,18 +328,11 @@ class TradeoffLine():
 
             # set number of points in vertical line to make more hover-able locations
             N_points = 100
+            # tables of the metrics for each model, with html line breaks
+            metric_tables = hover_tables(masked_df, x_col, trace_col, color_col, y_col,
+                                         color_hover, num_digits)
             # Add vertical lines one for each alpha
-            for anchor_loc, df_i in masked_df.groupby(x_col):
-                # get the metrics for this model out
-                metric_df = df_i[[y_col,trace_col,color_col,'color_hover']].rename(columns={'trace_col_hover':trace_col})
-                # make renaming dictionary
-                pivot_cols = {g:' '.join([g,color_hover]) for g in metric_df[color_col].unique()}
-                # pivot, reset index to flatten heading from mulitindex and rename columns
-                metric_pivot = metric_df.pivot(index=trace_col,columns=color_col, values=y_col).reset_index().rename(
-                                columns = pivot_cols)
-                # cast to string with float formatting and replace newlines with html breaks
-                metric_tbl = metric_pivot.to_string(index=False,
-                                                     float_format=lambda f:str(np.round(f,num_digits))).replace('\n','<br>')
+            for anchor_loc, metric_tbl in metric_tables.items():
                 # add vertical line of a number of points, 
                 #  store meta data so that the cloation can be picked out with js in the page
                 fig.add_trace(
@@ -251,4 +382,8 @@ class TradeoffLine():
                              range = [x_min, x_max])
             fig.update_yaxes(fixedrange=disable_zoom,
                              range=[y_min, y_max])
+            # values to log for each slider step (one per vertical line), so the page js 
+            # can look them up
+            fig.update_layout(meta={'location': [trace.meta['location'] for trace in fig.data[offset:]],
+                                    'initial': default_selection})
             return fig
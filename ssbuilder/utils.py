@@ -1,6 +1,14 @@
 import click
 import os
+import json
+import numpy as np
+import hashlib
+import tempfile
+import zipfile
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from urllib.parse import unquote
 
 def md_params(function):
     '''
@@ -149,7 +157,7 @@ def calculate_query_length(filename,vars_only=False,
 
 
 @click.command()
-@click.argument('folder', type=click.Path(exists=True))
+@click.argument('folder', nargs=-1, required=True, type=click.Path(exists=True))
 @click.option('-m', '--merge-on', default=['id'], multiple=True, 
               help='columns to merge on, if multiple pass each one with the option')
 @click.option('-h', '--header', default=0,
@@ -157,34 +165,299 @@ def calculate_query_length(filename,vars_only=False,
 @click.option('-s', '--skip-row', multiple=True, type=int, default=[1,2],
               help='row numbers to skip, counting from 0, passed 1 value to each flag. default [1,2]')
 @click.option('-o','--out-name',default=None,
-              help='file name to save new csv to, if not passed, folder name is used')
+              help='file name to save the merged data to, if not passed, folder name is used')
 @click.option('-v','--verbose',is_flag=True,
               help = 'show details of process for debugging purposes')
 @click.option('-c','--complete-only',is_flag=True,
               help='flag to keep only rows that exist in all files (if passed, uses inner merge, otherwise outer)')
+@click.option('-j','--jobs', default=1, type=int,
+              help='number of files to read at once, 0 uses all cores. default 1')
+@click.option('--pool', default='thread', type=click.Choice(['thread','process']),
+              help='use threads or processes when reading with more than one job')
+@click.option('-e','--engine', default='c', type=click.Choice(['c','python','pyarrow']),
+              help='csv parser to read the files with, pyarrow must be installed to use it')
+@click.option('-p','--partitions', default=None, type=int,
+              help='stream the merge through this many on disk partitions, for exports larger than memory')
+@click.option('--chunksize', default=100000, type=int,
+              help='rows to read at a time when streaming with partitions')
+@click.option('--temp-dir', default=None, type=click.Path(exists=True, file_okay=False),
+              help='where to write partitions, default is the system temp location')
+@click.option('-i','--store', default=None, type=click.Path(file_okay=False),
+              help='folder to keep parquet copies and a manifest in, to only read new or changed files')
+@click.option('-f','--out-format', default='csv', type=click.Choice(['csv','parquet','feather']),
+              help='file type to write, parquet and feather require pyarrow. default csv')
+@click.option('-z','--compact', is_flag=True,
+              help='make repeated text categorical and store numbers in the smallest type that fits')
+@click.option('-q','--query-codes', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='codes file from building with packed variables, to expand them to columns')
 def cmd_merge_dir_csvs(folder, merge_on, out_name, header,
-                        verbose, skip_row, complete_only):
+                        verbose, skip_row, complete_only, jobs, pool, engine,
+                        partitions, chunksize, temp_dir, store, out_format, compact,
+                        query_codes):
     '''
     merge all csvs in a folder into a single CSV file, with new columns ordered by 
-    what source file they came from alphabetically
+    what source file they came from alphabetically. Pass zip archives (eg qualtrics 
+    exports) to read the csvs in them without extracting, or more than one folder or 
+    archive to merge all of their csvs
     '''
     merge_dir_csvs(folder, merge_on, out_name, header,
-                   verbose, skip_row, complete_only)
+                   verbose, skip_row, complete_only, jobs, pool, engine,
+                   partitions, chunksize, temp_dir, store, out_format, compact,
+                   query_codes)
+
+
+def load_query_codes(file_name):
+    '''
+    load the codes saved when building with packed variables (`ssgeneratehtml -c`)
+
+    Returns
+    -------
+    query_codes : dictionary
+        `packed_var`, the parameter name, and `codes`, variable names as keys and codes as values
+    '''
+    with open(file_name, 'r') as f:
+        return json.load(f)
+
+
+def unpack_query_column(df, query_codes):
+    '''
+    expand the packed variables parameter into one column per variable, the packed
+    column is removed
+
+    Parameters
+    ----------
+    df : DataFrame
+        data with the packed column, eg a qualtrics export
+    query_codes : dictionary
+        output of `load_query_codes`
+
+    Returns
+    -------
+    df : DataFrame
+        data with a column for each variable in the packed values
+    '''
+    packed_var = query_codes['packed_var']
+    code_names = {code: var for var, code in query_codes['codes'].items()}
+
+    # one row per code.value pair, keeping the original row in the index
+    pairs = df[packed_var].astype(str).where(df[packed_var].notna()).str.split('*').explode()
+    pairs = pairs[pairs.str.contains('.', regex=False, na=False)]
+    split_pairs = pairs.str.split('.', n=1, expand=True)
+    # only unescape values that need it
+    values = split_pairs[1]
+    escaped = values.str.contains('%', regex=False)
+    values = values.where(~escaped, values[escaped].map(unquote))
+
+    unpacked = pd.DataFrame({'name': split_pairs[0].map(code_names), 'value': values})
+    unpacked = unpacked.dropna(subset=['name']).reset_index()
+    wide = unpacked.pivot(index=unpacked.columns[0], columns='name', values='value')
+    wide.columns.name = None
+
+    return df.drop(columns=packed_var).join(wide)
+
+
+def export_csv_sources(folders):
+    '''
+    find the csvs to merge in folders and zip archives
+
+    Parameters
+    ----------
+    folders : list of strings
+        folders and zip archives, the csvs in archives are listed without extracting
+
+    Returns
+    -------
+    file_list : list of strings
+        csv file names, or names in the archive, sorted alphabetically
+    sources : dictionary
+        the folder or archive each file is in, to pass as `folder` to the readers
+    '''
+    sources = {}
+    for folder in folders:
+        if os.path.isdir(folder):
+            file_names = [file for file in os.listdir(folder) if file[-4:]=='.csv']
+        else:
+            with zipfile.ZipFile(folder) as archive:
+                # skip the resource copies macos adds to archives
+                file_names = [member.filename for member in archive.infolist()
+                              if member.filename[-4:]=='.csv' and not(member.is_dir())
+                              and not(member.filename.startswith('__MACOSX/'))]
+        for file in file_names:
+            if file in sources:
+                # a later export of a survey has all of its responses, merge only the newest
+                raise click.ClickException(file + ' is in both ' + sources[file] + ' and ' 
+                                           + folder + ', pass exports of different surveys, '
+                                           'for repeated exports of a survey only the newest')
+            sources[file] = folder
+    return sorted(sources), sources
+
+
+def open_export_csv(file, folder=''):
+    '''
+    open one exported csv in binary mode, from a folder or streamed from a zip archive
+    without extracting it
+
+    Parameters
+    ----------
+    file : string
+        file name, or name in the archive
+    folder : string or dictionary
+        folder or zip archive the file is in, or a dictionary of file names to the folder
+        or archive each is in (see `export_csv_sources`)
+
+    Returns
+    -------
+    csv_file : file
+        open file, close it (eg use it in a with statement) when done
+    '''
+    if isinstance(folder, dict):
+        folder = folder[file]
+    if folder and os.path.isfile(folder):
+        # the member stays open after the archive is closed, and closes its file with it
+        with zipfile.ZipFile(folder) as archive:
+            return archive.open(file)
+    return open(os.path.join(folder, file), 'rb')
+
+
+def hash_export_csv(file, folder='', block_size=2**20):
+    '''
+    sha256 hash of an exported csv's contents, read in blocks
+
+    Parameters
+    ----------
+    file : string
+        file name, or name in the archive
+    folder : string or dictionary
+        folder or zip archive the file is in, see `open_export_csv`
+    block_size : int
+        bytes to read at a time
+
+    Returns
+    -------
+    file_hash : string
+        hex digest
+    '''
+    file_hash = hashlib.sha256()
+    with open_export_csv(file, folder) as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def read_export_csv(file, folder='', merge_on=['id'], header=0, skip_row=None, engine='c',
+                    query_codes=None):
+    '''
+    read one exported csv, dropping rows with no value for the merge columns and any 
+    duplicate values for the merge columns. Errors are tagged with the file name
+
+    Parameters
+    ----------
+    file : string
+        file name, used for the error note
+    folder : string or dictionary
+        folder or zip archive the file is in, see `open_export_csv`
+    merge_on : list of strings
+        columns that will be merged on
+    header : int
+        row to treat as the header (or anything that can be passed to pd.read_csv header
+        with the c or python engine)
+    skip_row : list of ints
+        rows to skip, counting from 0
+    engine : string {'c','python','pyarrow'}
+        parser to use
+    query_codes : dictionary {None}
+        output of `load_query_codes`, if passed and the file has the packed parameter
+        it is expanded to a column per variable
+
+    Returns
+    -------
+    df : DataFrame
+        the cleaned data from the file
+    '''
+    try:
+        with open_export_csv(file, folder) as csv_file:
+            if engine == 'pyarrow':
+                df = read_csv_pyarrow(csv_file, header, skip_row)
+            else:
+                # explicit indices let the parser skip rows without calling back into python
+                skip_rows = sorted(skip_row) if skip_row else None
+                df = pd.read_csv(csv_file, header=header, skiprows=skip_rows, engine=engine)
+        
+        df = df.dropna(subset=merge_on).drop_duplicates(subset=merge_on)
+        if query_codes and query_codes['packed_var'] in df.columns:
+            df = unpack_query_column(df, query_codes)
+        
+        return df
+    except Exception as e:
+        e.add_note(file)
+        raise(e)
+
+
+def read_csv_pyarrow(file_path, header=0, skip_row=None):
+    '''
+    read a csv with pyarrow, with the same header and skip row meaning as pd.read_csv 
+
+    pyarrow can only skip rows before the header and a block of rows directly after it, 
+    which covers the qualtrics exports (header then 2 rows of question text and import ids)
+
+    Parameters
+    ----------
+    file_path : string or file
+        path to the csv, or the csv opened in binary mode
+    header : int
+        row to treat as the header, counted after removing skipped rows
+    skip_row : list of ints
+        rows to skip, counting from 0
+
+    Returns
+    -------
+    df : DataFrame
+        data from the file
+    '''
+    try:
+        from pyarrow import csv as pa_csv
+    except ImportError as e:
+        e.add_note('the pyarrow engine requires pyarrow, install it or use the c engine')
+        raise(e)
+
+    skip_row = sorted(set(skip_row)) if skip_row else []
+    # find the header in the raw file, the n-th row that is not skipped
+    kept_rows = [r for r in range(header + len(skip_row) + 1) if not(r in skip_row)]
+    header_row = kept_rows[header]
+    # rows after the header can only be skipped as one block right after it
+    skip_after = [r for r in skip_row if r > header_row]
+    if not(skip_after == list(range(header_row + 1, header_row + 1 + len(skip_after)))):
+        raise ValueError('pyarrow engine can only skip rows directly after the header, '
+                         'use the c engine to skip ' + str(skip_after))
+
+    read_options = pa_csv.ReadOptions(skip_rows=header_row,
+                                      skip_rows_after_names=len(skip_after))
+    # treat empty strings as missing like pandas does
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    table = pa_csv.read_csv(file_path, read_options=read_options,
+                            convert_options=convert_options)
+    return table.to_pandas()
+
 
 def merge_dir_csvs(folder,merge_on='id',out_name=None, header=0, 
-                   verbose=False, skip_row =None,complete_only=False):
+                   verbose=False, skip_row =None,complete_only=False,
+                   jobs=1, pool='thread', engine='c',
+                   partitions=None, chunksize=100000, temp_dir=None, store=None,
+                   out_format='csv', compact=False, query_codes=None):
     '''
     merge all csvs in a folder into a single CSV file, with new columns ordered by 
     what source file they came from alphabetically
 
     Parameters
     ----------
-    folder : string
-        folder name
+    folder : string or list of strings
+        folder name, or zip archive whose csvs are read from the archive without 
+        extracting it, or a list of folders and archives to merge all of their csvs
     merge_on : string or list of strings
         column shared across all files, default id
     out_name : string
-        name to use the file, if not provided uses folder.csv
+        name to use the file, if not provided uses folder.csv (of the first folder or 
+        archive, without .zip)
     header : int
         row to treat as the header (or anything that can be passed to pd.read_csv header)
     skip_row : int
@@ -193,8 +466,37 @@ def merge_dir_csvs(folder,merge_on='id',out_name=None, header=0,
         print extra information out for debugging
     complete_only : bool
         if True use an inner merge, if not use outer merge
+    jobs : int {1}
+        number of files to read at the same time, 0 uses all available cores
+    pool : string {'thread','process'}
+        kind of pool to read files with when jobs is not 1
+    engine : string {'c','python','pyarrow'}
+        csv parser to use for reading the files, pyarrow is fastest but optional. 
+        Streaming with partitions always uses the c parser
+    partitions : int {None}
+        if passed, stream the files into this many on disk partitions by the merge 
+        columns and merge one partition at a time, so that only one partition is in memory.
+        Rows are written grouped by partition and values are kept as the text in the files
+    chunksize : int {100000}
+        number of rows to read at a time when streaming to partitions
+    temp_dir : string {None}
+        where to write the partitions, if not passed the system temp location is used
+    store : string {None}
+        folder to keep a parquet copy of each file and of the merged data, with a manifest
+        of file hashes. If passed, only new or changed files are read and, when new files
+        come after all of the stored ones, they are merged onto the stored result. Not used
+        when streaming with partitions
+    out_format : string {'csv','parquet','feather'}
+        file type to save, parquet and feather require pyarrow and are much faster to load
+    compact : bool
+        if True, make repeated text columns categorical and store numbers in the smallest 
+        type that keeps their values, see `compact_dtypes`
+    query_codes : string {None}
+        file of codes saved when building with packed variables (`ssgeneratehtml -c`), 
+        if passed the packed parameter is expanded to a column per variable in each file
     '''
-    
+    # click passes a tuple, and a single column can be passed as a string
+    merge_on = [merge_on] if type(merge_on) == str else list(merge_on)
 
     # parse compelte only into merge type
     if complete_only:
@@ -202,33 +504,221 @@ def merge_dir_csvs(folder,merge_on='id',out_name=None, header=0,
     else:
         merge_type = 'outer'
     
+    # click passes a tuple of folders, and a single one can be passed as a string
+    folders = [folder] if isinstance(folder, (str, os.PathLike)) else list(folder)
+
     # get all fo the files, sort alphabetically
-    file_list= sorted([file for file in os.listdir(folder) if file[-4:]=='.csv'])
+    #  each is read from the folder or archive it is in
+    file_list, folder = export_csv_sources(folders)
     if verbose:
         click.echo('found files: ' + str(len(file_list)) )
         click.echo('\n'.join(file_list))
 
+    # formate file name for saving use provided name if provided or folder name otherwise 
+    out_ext = '.' + out_format
+    if out_name:    
+        if not(out_name.endswith(out_ext)):
+            out_name += out_ext
+    else:
+        out_name = folders[0].strip('/')
+        if zipfile.is_zipfile(out_name) and out_name.endswith('.zip'):
+            out_name = out_name[:-len('.zip')]
+        out_name += out_ext
+
+    if partitions:
+        if not(out_format == 'csv') or compact or query_codes:
+            raise ValueError('streaming with partitions only writes csv without compacting '
+                             'or expanding packed variables')
+        r,c = stream_merge_dir_csvs(folder, file_list, merge_on, out_name, header,
+                                    verbose, skip_row, merge_type, jobs, pool,
+                                    partitions, chunksize, temp_dir)
+        done_msg = 'wrote out ({r},{c}) to {out_name}'
+        click.echo(done_msg.format(out_name=out_name,r=r,c=c))
+        return
+
     # load all of the datafiles, applying the same skip and header to each file
     # drop any rows that have no value for the merge column
     #  drop any duplicate values for the merge columns
-    data_frame_list = []
-    for file in file_list:
-        try:
-            data_frame_list.append(pd.read_csv(os.path.join(folder, file),
-                                       header=header, 
-                                       skiprows=lambda x: x in skip_row
-                                       ).dropna(subset=merge_on).drop_duplicates(subset=merge_on))
-        except Exception as e:
-            e.add_note(file)
-            raise(e)
-            
-                           
+    if query_codes:
+        query_codes = load_query_codes(query_codes)
+    read_file = partial(read_export_csv, folder=folder, merge_on=merge_on, header=header,
+                        skip_row=skip_row, engine=engine, query_codes=query_codes)
+    if store:
+        merge_options = {'merge_on': merge_on, 'header': header, 'merge_type': merge_type,
+                         'skip_row': sorted(skip_row) if skip_row else None,
+                         'query_codes': query_codes, 'engine': engine}
+        out_df = incremental_merge_dir_csvs(folder, file_list, store, read_file, merge_options,
+                                            verbose, jobs, pool)
+    else:
+        data_frame_list = map_files(read_file, file_list, jobs, pool)
+        
+        if verbose:
+            click.echo('loaded files: ' + str(len(data_frame_list)))
+
+        out_df = merge_frames(data_frame_list, file_list, merge_on, merge_type, verbose)
     
+    if compact:
+        out_df = compact_dtypes(out_df)
+        if verbose:
+            click.echo('compacted to ' + str(out_df.memory_usage(deep=True).sum()) + ' bytes')
+
+    # note that staring to save
     if verbose:
-        click.echo('loaded files: ' + str(len(data_frame_list)))
+        click.echo('all merged, saving next')
+
+    # save
+    write_data(out_df, out_name, out_format)
+
+    # report success, always
+    done_msg = 'wrote out ({r},{c}) to {out_name}'
+    r,c =out_df.shape
+    click.echo(done_msg.format(out_name=out_name,r=r,c=c))
+    # return out_df
+
+
+def write_data(df, out_name, out_format='csv'):
+    '''
+    save a DataFrame as csv (with the index), parquet or feather
+
+    Parameters
+    ----------
+    df : DataFrame
+        data to save
+    out_name : string
+        file name, including extension
+    out_format : string {'csv','parquet','feather'}
+        file type to save
+    '''
+    writers = {'csv': df.to_csv,
+               'parquet': df.to_parquet,
+               'feather': df.to_feather}
+    writers[out_format](out_name)
+
+
+def read_data(file_name):
+    '''
+    load data saved by `write_data` (eg a merged file from `merge_dir_csvs`), the 
+    type is set by the extension
+
+    Parameters
+    ----------
+    file_name : string
+        file name ending in .csv, .parquet or .feather
+
+    Returns
+    -------
+    df : DataFrame
+        the loaded data
+    '''
+    readers = {'.csv': lambda f: pd.read_csv(f, index_col=0),
+               '.parquet': pd.read_parquet,
+               '.feather': pd.read_feather}
+    return readers[os.path.splitext(file_name)[1]](file_name)
+
+
+def compact_dtypes(df, max_category_fraction=0.5):
+    '''
+    store each column in a smaller type without changing any values: text columns
+    with repeated values (eg qualtrics statuses, confirm values or question ids) become
+    categorical, whole numbers (eg `loc_<question_id>`) become the smallest integer type
+    that fits and other numbers (eg `ov_<question_id>`) become float32 if that writes 
+    every value out the same
+
+    Parameters
+    ----------
+    df : DataFrame
+        data to compact
+    max_category_fraction : float {.5}
+        text columns with at most this fraction of unique values (of the non missing) 
+        are made categorical
     
-        
+    Returns
+    -------
+    compact_df : DataFrame
+        data with the smaller types
+    '''
+    compact_df = df.copy()
+    for col in df.columns:
+        values = df[col].dropna()
+        if pd.api.types.is_bool_dtype(df[col]) or len(values) == 0:
+            continue
+
+        if pd.api.types.is_numeric_dtype(df[col]):
+            if (values % 1 == 0).all():
+                # whole numbers, use a nullable int type if there are missing values 
+                int_type = pd.to_numeric(values, downcast='integer').dtype.name
+                if values.size < df[col].size:
+                    int_type = int_type.capitalize()
+                compact_df[col] = df[col].astype(int_type)
+            elif pd.api.types.is_float_dtype(df[col]):
+                # keep float32 only if the values print back the same
+                float32_values = df[col].astype('float32')
+                reparsed = pd.to_numeric(float32_values.astype(str)).to_numpy(dtype='float64')
+                if np.array_equal(reparsed, df[col].to_numpy(dtype='float64'), equal_nan=True):
+                    compact_df[col] = float32_values
+        elif pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            if values.nunique() <= max_category_fraction * len(values):
+                compact_df[col] = df[col].astype('category')
+
+    return compact_df
+
+
+def map_files(read_file, file_list, jobs=1, pool='thread'):
+    '''
+    apply a reading function to each file, in a pool if more than one job
+    
+    Parameters
+    ----------
+    read_file : function
+        function that takes a file name
+    file_list : list of strings
+        files to read
+    jobs : int {1}
+        number of files to read at the same time, 0 uses all available cores
+    pool : string {'thread','process'}
+        kind of pool to use when jobs is not 1
+
+    Returns
+    -------
+    results : list
+        output of `read_file` for each file, in the same order as `file_list`
+    '''
+    if jobs == 1:
+        return [read_file(file) for file in file_list]
+
+    pool_types = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+    # map keeps the alphabetical order, errors are raised when reached
+    with pool_types[pool](max_workers=jobs or None) as executor:
+        return list(executor.map(read_file, file_list))
 
+
+def merge_frames(data_frame_list, file_list, merge_on=['id'], merge_type='outer', verbose=False,
+                 out_df=None):
+    '''
+    merge the data from each file, in order, using the source file name as the suffix 
+    for columns that repeat
+
+    Parameters
+    ----------
+    data_frame_list : list of DataFrames
+        data from each file
+    file_list : list of strings
+        the file names for each DataFrame
+    merge_on : list of strings
+        columns shared across all files
+    merge_type : string {'outer','inner'}
+        how to merge 
+    verbose : bool
+        print extra information out for debugging
+    out_df : DataFrame {None}
+        data already merged from earlier files, if passed all of the files are merged
+        onto it, the same as they would be merged after the first pair
+
+    Returns
+    -------
+    out_df : DataFrame
+        merged data
+    '''
     #ensure the merge_on column exists in all files
     # unique_ids = []
     for df,source_file in zip(data_frame_list,file_list):
@@ -241,54 +731,270 @@ def merge_dir_csvs(folder,merge_on='id',out_name=None, header=0,
     if verbose:
         click.echo('all have the merge column')
 
-    # merge the first two
-    #   use source data file as suffix for all columns that repeat
-    out_df = pd.merge(data_frame_list[0], data_frame_list[1], how=merge_type,
-                      suffixes=('_'+file_list[0][:-4],'_'+file_list[1][:-4]),
-                      on=merge_on)
-    
-    if verbose:
-        click.echo(
-            'first pair (' + file_list[0] + ', ' + file_list[1] + ') merged')
+    # files in folders in an archive are named by the file alone
+    suffix = lambda source_file: '_' + source_file.split('/')[-1][:-4]
+
+    if out_df is None:
+        # merge the first two
+        #   use source data file as suffix for all columns that repeat
+        out_df = pd.merge(data_frame_list[0], data_frame_list[1], how=merge_type,
+                          suffixes=(suffix(file_list[0]), suffix(file_list[1])),
+                          on=merge_on)
+        
+        if verbose:
+            click.echo(
+                'first pair (' + file_list[0] + ', ' + file_list[1] + ') merged')
+        data_frame_list = data_frame_list[2:]
+        file_list = file_list[2:]
     
     # if more, keep merging
-    if len(file_list) >2:
-        for next_df,source_file in zip(data_frame_list[2:],file_list[2:]):
-            # note the size before merging for debugging
-            if verbose:
-                r,c = next_df.shape
-                msg = 'adding {source_file} ({r},{c})'
-                click.echo(msg.format( source_file=source_file,r=r,c=c))
-
-            # merge the previous with the new one, 
-            #  first suffix blank because it's many sub-frames that have already been merged
-            out_df = pd.merge(out_df, next_df, on = merge_on, how=merge_type,
-                              suffixes=('', '_'+source_file[:-4]))
-            
-            #  describe total size if successful in debug mode
-            if verbose:
-                r,c = out_df.shape
-                added_msg = 'added {source_file} total size is now ({r},{c})'
-                click.echo(added_msg.format(source_file=source_file, r=r, c=c))
-    
+    for next_df,source_file in zip(data_frame_list,file_list):
+        # note the size before merging for debugging
+        if verbose:
+            r,c = next_df.shape
+            msg = 'adding {source_file} ({r},{c})'
+            click.echo(msg.format( source_file=source_file,r=r,c=c))
+
+        # merge the previous with the new one, 
+        #  first suffix blank because it's many sub-frames that have already been merged
+        out_df = pd.merge(out_df, next_df, on = merge_on, how=merge_type,
+                          suffixes=('', suffix(source_file)))
+        
+        #  describe total size if successful in debug mode
+        if verbose:
+            r,c = out_df.shape
+            added_msg = 'added {source_file} total size is now ({r},{c})'
+            click.echo(added_msg.format(source_file=source_file, r=r, c=c))
+
+    return out_df
+
+
+def incremental_merge_dir_csvs(folder, file_list, store, read_file, merge_options,
+                               verbose=False, jobs=1, pool='thread'):
+    '''
+    merge using a store of previously read files, reading only new or changed files. 
     
-    # note that staring to save
-    if verbose:
-        click.echo('all merged, saving next')
+    The store has `manifest.json` with the hash of each file and the merge options, 
+    `sources/<file>.parquet` with the cleaned data from each file and `merged.parquet`.
+    When the only changes are new files that sort after all of the stored files, they 
+    are merged onto `merged.parquet`, otherwise the merge is redone from the stored 
+    sources, which gives the same result as merging all of the files.
 
+    Parameters
+    ----------
+    folder : string or dictionary
+        folder or zip archive the files are in, see `open_export_csv`
+    file_list : list of strings
+        files in the folder to merge, in order
+    store : string
+        folder for the store, created if it does not exist
+    read_file : function
+        function that reads and cleans one file, given its name
+    merge_options : dictionary
+        `merge_on`, `merge_type`, `header`, `skip_row`, `query_codes` and `engine` (the 
+        parsers give some columns different types); if these change from the stored 
+        ones, all files are read again
+    verbose : bool
+        print extra information out for debugging
+    jobs : int {1}
+        number of files to read at the same time, 0 uses all available cores
+    pool : string {'thread','process'}
+        kind of pool to read files with when jobs is not 1
+
+    Returns
+    -------
+    out_df : DataFrame
+        merged data
+    '''
+    manifest_path = os.path.join(store, 'manifest.json')
+    merged_path = os.path.join(store, 'merged.parquet')
+    source_path = lambda file: os.path.join(store, 'sources', file + '.parquet')
+    os.makedirs(os.path.join(store, 'sources'), exist_ok=True)
+
+    stored_files = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        # anything stored with other options can't be reused
+        if manifest['options'] == merge_options:
+            stored_files = manifest['files']
+        elif verbose:
+            click.echo('merge options changed, reading all files')
+
+    file_hashes = dict(zip(file_list, 
+                           map_files(lambda file: hash_export_csv(file, folder),
+                                     file_list, jobs, 'thread')))
+    changed_files = [file for file in file_list 
+                     if not(stored_files.get(file) == file_hashes[file])]
+    removed_files = [file for file in stored_files if not(file in file_hashes)]
+    if verbose:
+        click.echo('new or changed files: ' + str(len(changed_files)))
+        click.echo('\n'.join(changed_files))
+        click.echo('removed files: ' + str(len(removed_files)))
+
+    # read only what changed and store it
+    for file, df in zip(changed_files, map_files(read_file, changed_files, jobs, pool)):
+        # files in folders in an archive are stored in the same folders
+        os.makedirs(os.path.dirname(source_path(file)), exist_ok=True)
+        df.to_parquet(source_path(file))
+    for file in removed_files:
+        if os.path.isfile(source_path(file)):
+            os.remove(source_path(file))
+
+    merged_files = [file for file in file_list if file in stored_files]
+    appended_files = [file for file in changed_files if not(file in stored_files)]
+    only_appended = (not(removed_files) and len(merged_files) >= 2
+                     and merged_files == file_list[:len(merged_files)]
+                     and set(changed_files) == set(appended_files)
+                     and os.path.isfile(merged_path))
     
-    # formate file name for saving use provided name if provided or folder name otherwise 
-    if out_name:    
-        if not(out_name[-4:] == '.csv'):
-            out_name += '.csv'
+    if only_appended and not(changed_files):
+        out_df = pd.read_parquet(merged_path)
+    elif only_appended:
+        if verbose:
+            click.echo('merging new files onto stored data')
+        out_df = merge_frames([pd.read_parquet(source_path(file)) for file in appended_files],
+                              appended_files, merge_options['merge_on'], 
+                              merge_options['merge_type'], verbose,
+                              out_df=pd.read_parquet(merged_path))
     else:
-        out_name = folder.strip('/')+'.csv'
+        data_frame_list = [pd.read_parquet(source_path(file)) for file in file_list]
+        out_df = merge_frames(data_frame_list, file_list, merge_options['merge_on'], 
+                              merge_options['merge_type'], verbose)
 
-    # save
-    out_df.to_csv(out_name)
+    if changed_files or removed_files or not(os.path.isfile(merged_path)):
+        out_df.to_parquet(merged_path)
+        with open(manifest_path, 'w') as f:
+            json.dump({'options': merge_options, 'files': file_hashes}, f, indent=2)
 
-    # report success, always
-    done_msg = 'wrote out ({r},{c}) to {out_name}'
-    r,c =out_df.shape
-    click.echo(done_msg.format(out_name=out_name,r=r,c=c))
-    # return out_df
\ No newline at end of file
+    return out_df
+
+
+def partition_export_csv(file, folder, partition_dir, merge_on=['id'], header=0,
+                         skip_row=None, partitions=16, chunksize=100000):
+    '''
+    split one exported csv into partitions by hashing the merge columns, reading 
+    `chunksize` rows at a time. Each partition is written to 
+    `partition_dir/<partition number>/<file>`. Errors are tagged with the file name
+
+    Parameters
+    ----------
+    file : string
+        file name
+    folder : string or dictionary
+        folder or zip archive the file is in, see `open_export_csv`
+    partition_dir : string
+        folder to write the partitions to
+    merge_on : list of strings
+        columns to partition on, rows missing them are dropped
+    header : int
+        row to treat as the header
+    skip_row : list of ints
+        rows to skip, counting from 0
+    partitions : int
+        number of partitions
+    chunksize : int
+        rows to read at a time
+    '''
+    skip_rows = sorted(skip_row) if skip_row else None
+    part_paths = [os.path.join(partition_dir, str(p), file) for p in range(partitions)]
+    try:
+        for part_path in part_paths:
+            os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        # read as text, so keys hash the same in every file and values are written as is
+        with open_export_csv(file, folder) as csv_file, pd.read_csv(
+                csv_file, header=header, skiprows=skip_rows, dtype=str,
+                chunksize=chunksize) as reader:
+            for chunk_num, chunk in enumerate(reader):
+                if chunk_num == 0:
+                    # every partition gets the header, so empty partitions still merge
+                    for part_path in part_paths:
+                        chunk.iloc[:0].to_csv(part_path, index=False)
+
+                chunk = chunk.dropna(subset=merge_on)
+                part_num = pd.util.hash_pandas_object(chunk[merge_on], index=False) % partitions
+                for p, part_df in chunk.groupby(part_num.to_numpy()):
+                    part_df.to_csv(part_paths[p], mode='a', header=False, index=False)
+    except Exception as e:
+        e.add_note(file)
+        raise(e)
+
+
+def stream_merge_dir_csvs(folder, file_list, merge_on, out_name, header=0,
+                          verbose=False, skip_row=None, merge_type='outer',
+                          jobs=1, pool='thread', partitions=16, chunksize=100000,
+                          temp_dir=None):
+    '''
+    merge csvs with bounded memory: partition every file by the merge columns on disk, 
+    then merge and write out one partition at a time. Rows with the same merge values 
+    are always in the same partition, so dropping missing and duplicate merge values
+    per partition is the same as for the whole file
+
+    Parameters
+    ----------
+    folder : string or dictionary
+        folder or zip archive the files are in, see `open_export_csv`
+    file_list : list of strings
+        files in the folder to merge, in order
+    merge_on : list of strings
+        column shared across all files
+    out_name : string
+        csv file to write to
+    header : int
+        row to treat as the header
+    verbose : bool
+        print extra information out for debugging
+    skip_row : list of ints
+        rows to skip, counting from 0
+    merge_type : string {'outer','inner'}
+        how to merge 
+    jobs : int {1}
+        number of files to partition at the same time, 0 uses all available cores
+    pool : string {'thread','process'}
+        kind of pool to use when jobs is not 1
+    partitions : int
+        number of partitions
+    chunksize : int
+        rows to read at a time
+    temp_dir : string {None}
+        where to write the partitions
+
+    Returns
+    -------
+    shape : tuple
+        rows and columns written
+    '''
+    with tempfile.TemporaryDirectory(dir=temp_dir) as partition_dir:
+        for p in range(partitions):
+            os.makedirs(os.path.join(partition_dir, str(p)))
+
+        partition_file = partial(partition_export_csv, folder=folder, 
+                                 partition_dir=partition_dir, merge_on=merge_on,
+                                 header=header, skip_row=skip_row,
+                                 partitions=partitions, chunksize=chunksize)
+        map_files(partition_file, file_list, jobs, pool)
+        if verbose:
+            click.echo('partitioned files: ' + str(len(file_list)))
+
+        n_rows = 0
+        out_cols = None
+        for p in range(partitions):
+            part_dir = os.path.join(partition_dir, str(p))
+            data_frame_list = [pd.read_csv(os.path.join(part_dir, file), dtype=str
+                                           ).drop_duplicates(subset=merge_on)
+                               for file in file_list]
+            part_df = merge_frames(data_frame_list, file_list, merge_on, merge_type)
+            
+            # continue the index across partitions, like a single merged frame
+            part_df.index = pd.RangeIndex(n_rows, n_rows + len(part_df))
+            if out_cols is None:
+                out_cols = part_df.columns
+                part_df.to_csv(out_name)
+            else:
+                part_df[out_cols].to_csv(out_name, mode='a', header=False)
+            n_rows += len(part_df)
+
+            if verbose:
+                click.echo('merged partition ' + str(p) + ' total rows now ' + str(n_rows))
+
+    return n_rows, len(out_cols)
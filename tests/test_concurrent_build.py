@@ -0,0 +1,79 @@
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import yaml
+
+from ssbuilder import build_files, load_configuration
+from ssbuilder.builder import figure_classes
+
+data_file = os.path.join(os.path.dirname(__file__), '..', 'docs', 'source', '_examples',
+                         'tall_pretty.csv')
+
+shared = {'figure_type': 'NormalCurveSlider', 'confirm_var_name': 'confirm'}
+normal_vars = {'location_var_name': 'loc', 'overlap_var_name': 'ov'}
+
+configurations = {
+    'chain': {
+        'shared': shared,
+        'unique': [
+            {'question_id': 'intro', 'figure_type': 'InstructionQuestion', 'logging_vars': {},
+             'question_text': 'Welcome', 'next_question_url': 'q1', 'footer_type': 'next'},
+            {'question_id': 'q1', 'logging_vars': normal_vars,
+             'figure_values': {'static_mean': 60},
+             'question_text': 'Move the slider', 'next_question_url': 'tl'},
+            {'question_id': 'tl', 'figure_type': 'TradeoffLine',
+             'logging_vars': {'location_var_name': 'model_number'},
+             'figure_values': {'pretty_data_file': data_file},
+             'next_question_url': 'https://example.qualtrics.com/jfe/form/SV_abc'},
+        ]},
+    'variants': {
+        'shared': shared,
+        'unique': [
+            {'question_id': 'q1', 'logging_vars': normal_vars,
+             'figure_values': {'static_mean': 60}, 'next_question_url': 'q2'},
+            {'question_id': 'q2', 'logging_vars': normal_vars,
+             'figure_values': {'static_mean': 30}, 'next_question_url': 'end.html'},
+        ],
+        'variants': {
+            'orders': {'ab': ['q1', 'q2'], 'ba': ['q2', 'q1']},
+            'conditions': {'framing': {'gain': {'q1': {'question_text': 'Gain framing'}},
+                                       'loss': {'q1': {'question_text': 'Loss framing'}}}}}},
+}
+
+build_options = [{}, {'compact_query': True}, {'static_preview': True, 'figure_assets': True}]
+
+
+@pytest.fixture(scope='module')
+def loaded_configurations(tmp_path_factory):
+    config_dir = tmp_path_factory.mktemp('configurations')
+    loaded = {}
+    for name, configuration in configurations.items():
+        config_file = config_dir / (name + '.yml')
+        config_file.write_text(yaml.dump(configuration))
+        loaded[name] = load_configuration(str(config_file))
+    return loaded
+
+
+def test_concurrent_builds_match_sequential(loaded_configurations):
+    originals = copy.deepcopy(loaded_configurations)
+    class_defaults = {name: getattr(figure_class(), 'logging_vars', None)
+                      for name, figure_class in figure_classes.items()}
+
+    jobs = [(name, i) for name in loaded_configurations
+            for i in range(len(build_options))]
+    sequential = {job: build_files(loaded_configurations[job[0]], **build_options[job[1]])
+                  for job in jobs}
+    assert loaded_configurations == originals
+
+    build = lambda job: build_files(loaded_configurations[job[0]], **build_options[job[1]])
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        concurrent = list(executor.map(build, jobs * 3))
+
+    for job, files in zip(jobs * 3, concurrent):
+        assert files == sequential[job], job
+    # nothing the builds were passed or share is changed
+    assert loaded_configurations == originals
+    assert class_defaults == {name: getattr(figure_class(), 'logging_vars', None)
+                              for name, figure_class in figure_classes.items()}
@@ -0,0 +1,44 @@
+import os
+
+import yaml
+
+from ssbuilder import build_files, load_configuration
+
+data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+configuration = {
+    'shared': {'figure_type': 'NormalCurveSlider', 'confirm_var_name': 'confirm'},
+    'unique': [
+        {'question_id': 'intro', 'figure_type': 'InstructionQuestion', 'logging_vars': {},
+         'question_text': 'Welcome to the **study**', 'next_question_url': 'q1',
+         'footer_type': 'next'},
+        {'question_id': 'q1', 'logging_vars': {'location_var_name': 'loc',
+                                                'overlap_var_name': 'ov'},
+         'question_text': 'Move the slider', 'figure_values': {'static_mean': 60},
+         'next_question_url': 'https://example.qualtrics.com/jfe/form/SV_abc'},
+    ]}
+
+
+def build_default(tmp_path):
+    config_file = tmp_path / 'default.yml'
+    config_file.write_text(yaml.dump(configuration))
+    return build_files(load_configuration(str(config_file)))
+
+
+def test_default_build_is_unchanged(tmp_path):
+    files = build_default(tmp_path)
+    # only the pages, nothing from the options that are off by default
+    assert sorted(files) == ['intro.html', 'q1.html']
+    # the instruction page is the same as before any build options were added
+    with open(os.path.join(data_dir, 'default_intro.html'), 'rb') as f:
+        assert files['intro.html'] == f.read()
+
+
+def test_default_build_has_no_optional_features(tmp_path):
+    files = build_default(tmp_path)
+    for page in files.values():
+        page = page.decode('utf-8')
+        assert not('rel="prefetch"' in page)
+        assert not('serviceWorker' in page)
+        assert not('tload_' in page)
+        assert not('data-src' in page)
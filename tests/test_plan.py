@@ -0,0 +1,40 @@
+import os
+
+import yaml
+
+from ssbuilder import tradeoff_questions
+from ssbuilder.builder import figure_classes, plan_configuration
+
+data_file = os.path.join(os.path.dirname(__file__), '..', 'docs', 'source', '_examples',
+                         'tall_pretty.csv')
+
+configuration = {
+    'shared': {'confirm_var_name': 'confirm'},
+    'unique': [
+        {'question_id': 'q1', 'logging_vars': {'location_var_name': 'loc',
+                                                'overlap_var_name': 'ov'},
+         'figure_values': {'static_mean': 60}, 'next_question_url': 'tl'},
+        {'question_id': 'tl', 'figure_type': 'TradeoffLine',
+         'logging_vars': {'location_var_name': 'model_number'},
+         'figure_values': {'pretty_data_file': data_file},
+         'next_question_url': 'https://example.qualtrics.com/jfe/form/SV_abc'},
+    ]}
+
+
+def test_plan_makes_no_figures(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('the plan made a figure or read a data file')
+    monkeypatch.setattr(tradeoff_questions, 'read_data_file', fail)
+    for figure_class in figure_classes.values():
+        monkeypatch.setattr(figure_class, 'generate_figure', fail)
+        monkeypatch.setattr(figure_class, 'logging_values', fail)
+
+    config_file = tmp_path / 'plan.yml'
+    config_file.write_text(yaml.dump(configuration))
+    plan = plan_configuration(str(config_file))
+
+    assert list(plan['page']) == ['q1.html', 'tl.html']
+    assert list(plan['forward_type']) == ['internal', 'external']
+    assert plan.loc[1, 'send_vars'].split() == ['confirm_q1', 'id', 'loc_q1', 'ov_q1',
+                                                'confirm_tl', 'model_number_tl']
+    assert plan.loc[1, 'data_bytes'] == os.path.getsize(data_file)
@@ -0,0 +1,58 @@
+import click
+import numpy as np
+import pandas as pd
+import pytest
+
+from ssbuilder import join_question_catalog, reshape_long
+
+full_config = [
+    {'question_id': 'q1', 'figure_type': 'NormalCurveSlider', 'question_text': 'First',
+     'logging_vars': {'location_var_name': 'loc', 'overlap_var_name': 'ov'}},
+    {'question_id': 'q2', 'figure_type': 'TradeoffBar', 'question_text': 'Second',
+     'logging_vars': {'location_var_name': 'model_number'}},
+]
+
+
+def test_one_row_per_participant_and_question():
+    responses = pd.DataFrame({'id': [7, 8], 'loc_q1': [10, 20], 'ov_q1': [0.5, 0.25],
+                              'confirm_q1': ['confirmed', 'skip'],
+                              'model_number_q2': ['default', '3'], 'confirm_q2': ['skip', None]})
+    question_df = join_question_catalog(responses, full_config)
+
+    assert list(question_df.columns) == ['id', 'question_id', 'source', 'location', 'overlap',
+                                         'confirm', 'figure_type', 'question_text']
+    assert list(question_df['id']) == [7, 8, 7, 8]
+    assert list(question_df['question_id']) == ['q1', 'q1', 'q2', 'q2']
+    assert question_df['source'].isna().all()
+    # a location is text for the tradeoff question, so it is text for all of them
+    assert list(question_df['location']) == ['10', '20', 'default', '3']
+    assert pd.api.types.is_float_dtype(question_df['overlap'])
+    assert question_df['overlap'].iloc[2:].isna().all()
+    assert list(question_df['question_text']) == ['First', 'First', 'Second', 'Second']
+
+
+def test_numbers_stay_numbers():
+    responses = pd.DataFrame({'id': [1, 2], 'loc_q1': ['10', None], 'model_number_q2': [3, 4]})
+    question_df = join_question_catalog(responses, full_config)
+    assert pd.api.types.is_float_dtype(question_df['location'])
+    np.testing.assert_array_equal(question_df['location'], [10, np.nan, 3, 4])
+
+
+def test_suffixed_columns():
+    # loc_q1 was in both merged files, so merge_dir_csvs added each file's name
+    responses = pd.DataFrame({'id': [1, 2], 'loc_q1_day1': [10, 20], 'loc_q1_day2': [30, 40],
+                              'ov_q1': [0.5, 0.25]})
+    question_df = join_question_catalog(responses, full_config)
+
+    assert list(question_df['source'].fillna('')) == ['', '', 'day1', 'day1', 'day2', 'day2']
+    assert list(question_df['location'].fillna(-1)) == [-1, -1, 10, 20, 30, 40]
+    assert list(question_df['overlap'].fillna(-1)) == [0.5, 0.25, -1, -1, -1, -1]
+    # the same columns match the same variables as in the long format
+    long_df = reshape_long(responses, full_config)
+    assert sorted(long_df['source'].dropna().unique()) == ['day1', 'day2']
+    assert set(long_df['question_id']) == {'q1'}
+
+
+def test_no_question_variables():
+    with pytest.raises(click.ClickException, match='loc_q1'):
+        join_question_catalog(pd.DataFrame({'id': [1], 'other': [2]}), full_config)
@@ -0,0 +1,45 @@
+import tarfile
+import zipfile
+
+import pytest
+
+from ssbuilder import TarSink, ZipSink, build_study
+
+full_config = [
+    {'question_id': 'intro', 'figure_type': 'InstructionQuestion', 'logging_vars': {},
+     'question_text': 'Welcome', 'next_question_url': 'q1', 'footer_type': 'next'},
+    {'question_id': 'q1', 'logging_vars': {'location_var_name': 'loc', 'overlap_var_name': 'ov'},
+     'question_text': 'Move the slider', 'figure_values': {'static_mean': 60},
+     'next_question_url': 'https://example.qualtrics.com/jfe/form/SV_abc'},
+]
+
+
+def archive_names(archive_path):
+    if archive_path.endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            return sorted(archive.namelist())
+    with tarfile.open(archive_path) as archive:
+        return sorted(archive.getnames())
+
+
+@pytest.mark.parametrize('sink, name', [(ZipSink, 'study.zip'), (TarSink, 'study.tar')])
+def test_rebuild_into_archive(tmp_path, sink, name):
+    archive_path = str(tmp_path / name)
+    first = build_study(full_config, sink(archive_path), manifest=True)['manifest']
+    assert first['added'] == ['intro.html', 'q1.html']
+
+    again = build_study(full_config, sink(archive_path), manifest=True)['manifest']
+    assert again['added'] == [] and again['changed'] == []
+    assert again['unchanged'] == ['intro.html', 'q1.html']
+
+    # a question that is no longer built is removed from the archive
+    changed = build_study(full_config[1:], sink(archive_path), manifest=True)['manifest']
+    assert changed['removed'] == ['intro.html']
+    assert archive_names(archive_path) == ['q1.html', 'ss-manifest.json']
+
+
+def test_unreadable_archive_is_replaced(tmp_path):
+    archive_path = tmp_path / 'study.zip'
+    archive_path.write_bytes(b'not a zip')
+    manifest = build_study(full_config, ZipSink(str(archive_path)), manifest=True)['manifest']
+    assert manifest['added'] == ['intro.html', 'q1.html']